@@ -0,0 +1,208 @@
+from algorithm.mcts_node import uct_best_index, np
+from algorithm.macros import VECTORIZED_UCT
+from array import array
+import math
+
+NO_NODE = -1
+
+class ArrayTree:
+
+    # Struct-of-arrays storage for the search tree: node i is the i-th entry of every column and
+    # children are linked through first_child/next_sibling, so no per-node Python objects are kept.
+    def __init__(self, expansion_limit):
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.last_child = array('i')
+        self.next_sibling = array('i')
+        self.num_children = array('i')
+        self.expansion_limit = array('i')
+        self.depth = array('h')
+        self.visits = array('i')
+        self.score_hard = array('d')
+        self.score_soft = array('d')
+        self.best_hard_penalty = array('d')
+        self.best_soft_penalty = array('d')
+        self.event = array('h')
+        self.weekday = array('h')
+        self.timeslot = array('h')
+        self.room = array('h')
+
+        self.root = ArrayTreeNode(self, self.add_node(NO_NODE, expansion_limit, None))
+
+
+    def __len__(self):
+        return len(self.parent)
+
+
+    def add_node(self, parent, expansion_limit, assignment):
+        index = len(self.parent)
+        event, weekday, timeslot, room = assignment if assignment is not None else (NO_NODE, NO_NODE, NO_NODE, NO_NODE)
+
+        self.parent.append(parent)
+        self.first_child.append(NO_NODE)
+        self.last_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.num_children.append(0)
+        self.expansion_limit.append(expansion_limit)
+        self.depth.append(self.depth[parent] + 1 if parent != NO_NODE else 0)
+        self.visits.append(0)
+        self.score_hard.append(0)
+        self.score_soft.append(0)
+        self.best_hard_penalty.append(float("-inf"))
+        self.best_soft_penalty.append(float("-inf"))
+        self.event.append(event)
+        self.weekday.append(weekday)
+        self.timeslot.append(timeslot)
+        self.room.append(room)
+
+        if parent != NO_NODE:
+            if self.last_child[parent] == NO_NODE: self.first_child[parent] = index
+            else: self.next_sibling[self.last_child[parent]] = index
+            self.last_child[parent] = index
+            self.num_children[parent] += 1
+        return index
+
+
+    def children(self, index):
+        child = self.first_child[index]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+
+    def best_child(self, index, children, c_param):
+        visits, score_hard, score_soft = self.visits, self.score_hard, self.score_soft
+        log_visits = math.log(visits[index])
+
+        best_children, max_weight = [], float("-inf")
+        for child in children:
+            weight = score_hard[child] / visits[child] + 2 * c_param * math.sqrt((2 * log_visits / visits[child]))
+            if weight > max_weight:
+                best_children, max_weight = [child], weight
+            elif weight == max_weight:
+                best_children.append(child)
+
+        best_child, max_weight = NO_NODE, float("-inf")
+        for child in best_children:
+            weight = score_soft[child] / visits[child] + c_param * math.sqrt((2 * log_visits / visits[child]))
+            if weight > max_weight:
+                best_child, max_weight = child, weight
+        return best_child
+
+
+    def best_child_vectorized(self, index, children, c_param):
+        # gathers the child columns straight from the array buffers; indexing copies, so no view outlives the call
+        # and blocks the columns from growing
+        child_indices = np.array(children, dtype=np.intp)
+        return children[uct_best_index(
+            self.visits[index],
+            np.frombuffer(self.visits, dtype=np.intc)[child_indices],
+            np.frombuffer(self.score_hard, dtype=np.float64)[child_indices],
+            np.frombuffer(self.score_soft, dtype=np.float64)[child_indices],
+            c_param
+        )]
+
+
+    def backpropagate(self, index, result_hard, result_soft):
+        parent, visits, score_hard, score_soft = self.parent, self.visits, self.score_hard, self.score_soft
+        while index != NO_NODE:
+            visits[index] += 1
+            score_hard[index] += result_hard
+            score_soft[index] += result_soft
+            index = parent[index]
+
+
+    def add_virtual_loss(self, index, virtual_loss):
+        parent, visits = self.parent, self.visits
+        while index != NO_NODE:
+            visits[index] += virtual_loss
+            index = parent[index]
+
+
+class ArrayTreeNode:
+
+    # Handle with the MCTSNode interface over one entry of an ArrayTree, created on demand
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayTreeNode) and self.tree is other.tree and self.index == other.index
+
+
+    def __hash__(self):
+        return hash(self.index)
+
+
+    def _column(name):
+        return property(
+            lambda self: getattr(self.tree, name)[self.index],
+            lambda self, value: getattr(self.tree, name).__setitem__(self.index, value)
+        )
+
+    depth = _column("depth")
+    visits = _column("visits")
+    score_hard = _column("score_hard")
+    score_soft = _column("score_soft")
+    best_hard_penalty = _column("best_hard_penalty")
+    best_soft_penalty = _column("best_soft_penalty")
+    expansion_limit = _column("expansion_limit")
+    del _column
+
+
+    @property
+    def parent(self):
+        parent = self.tree.parent[self.index]
+        return ArrayTreeNode(self.tree, parent) if parent != NO_NODE else None
+
+
+    @property
+    def children(self): # pruned expansions have no entry, only num_children counts them
+        return [ArrayTreeNode(self.tree, child) for child in self.tree.children(self.index)]
+
+
+    @property
+    def assignment(self):
+        tree, index = self.tree, self.index
+        if tree.event[index] == NO_NODE: return None
+        return (tree.event[index], tree.weekday[index], tree.timeslot[index], tree.room[index])
+
+
+    def is_fully_expanded(self):
+        expansion_limit = self.tree.expansion_limit[self.index]
+        return expansion_limit == 0 or self.tree.num_children[self.index] == expansion_limit
+
+
+    def is_terminal_node(self, num_events):
+        return self.tree.expansion_limit[self.index] == 0 or self.tree.depth[self.index] == num_events
+
+
+    def expanded(self):
+        return self.tree.num_children[self.index]
+
+
+    def add_child(self, expansion_limit, assignment):
+        return ArrayTreeNode(self.tree, self.tree.add_node(self.index, expansion_limit, assignment))
+
+
+    def add_pruned_child(self):
+        self.tree.num_children[self.index] += 1
+
+
+    def select_child(self, c_param):
+        tree = self.tree
+        unflagged_children = [child for child in tree.children(self.index) if tree.expansion_limit[child] != 0]
+        if not unflagged_children: return None
+        if VECTORIZED_UCT: return ArrayTreeNode(tree, tree.best_child_vectorized(self.index, unflagged_children, c_param))
+        return ArrayTreeNode(tree, tree.best_child(self.index, unflagged_children, c_param))
+
+
+    def backpropagate(self, result_hard, result_soft):
+        self.tree.backpropagate(self.index, result_hard, result_soft)
+
+
+    def add_virtual_loss(self, virtual_loss):
+        self.tree.add_virtual_loss(self.index, virtual_loss)
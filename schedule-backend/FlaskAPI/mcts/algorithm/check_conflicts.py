@@ -1,140 +1,131 @@
 from algorithm.macros import HARD_PENALTY, MIN_WORKING_DAYS_PENALTY, CURRICULUM_COMPACTNESS_PENALTY
+from collections import defaultdict
 
 class ConflictsChecker:
 
-    def __init__(self, constraints, blocks, rooms, name_to_event_ids):
-        self.constraints = constraints
-        self.blocks = blocks.values()
-        self.rooms = rooms
-        self.name_to_event_ids = name_to_event_ids
+    def __init__(self, state):
+        self.course_unavailable = state.course_unavailable
+        self.course_events = state.course_events
+        self.course_min_days = state.course_min_days
+        self.course_curricula = state.course_curricula
+        self.curriculum_courses = state.curriculum_courses
+        self.capacity = state.capacity
+        self.room_capacity = state.room_capacity
+        self.build_conflict_graph(state)
+
+
+    def build_conflict_graph(self, state):
+        # for each event, the events it can't share a period with and the hard penalty of doing so: lectures of the
+        # same course or teacher count HARD_PENALTY, sharing a curriculum adds 1
+        teacher_events = defaultdict(list)
+        for event, teacher in enumerate(state.teacher):
+            teacher_events[teacher].append(event)
+
+        self.conflict_weights = []
+        for event, course in enumerate(state.course):
+            weights = {}
+            for other_event in teacher_events[state.teacher[event]] + self.course_events[course]:
+                weights[other_event] = HARD_PENALTY
+
+            curriculum_events = {other_event for curriculum in self.course_curricula[course] for other_course in self.curriculum_courses[curriculum] for other_event in self.course_events[other_course]}
+            for other_event in curriculum_events:
+                weights[other_event] = weights.get(other_event, 0) + 1
+
+            weights.pop(event, None)
+            self.conflict_weights.append(weights)
 
 
     @staticmethod
-    def check_conflict_time(other, timeslot, weekday):
-        if other["Timeslot"] is None or other["WeekDay"] is None:
-            return False
-        return other["WeekDay"] == weekday and other["Timeslot"] == timeslot
+    def check_conflict_time(state, other, timeslot, weekday):
+        return state.weekday[other] == weekday and state.timeslot[other] == timeslot
 
 
     # Hard Constraints:
-    
-    def check_event_hard_constraints(self, event, other_events, room_id, timeslot, weekday, room_conflicts = None):
-        if timeslot is None or weekday is None or room_id is None: return HARD_PENALTY
-
-        penalty = (
-            self.check_event_unavailability_constraints(event, timeslot, weekday)
-            + self.check_block_constraints(event, other_events, timeslot, weekday)
-        )
-        
-        for other_event in other_events.values():
-            if other_event["Id"] != event["Id"] and self.check_conflict_time(other_event, timeslot, weekday):
-                if other_event['Name'] == event["Name"]:
-                    penalty += HARD_PENALTY
-                else:
-                    if other_event['RoomId'] == room_id:
-                        if room_conflicts is not None: self.room_conflicts(other_event, room_conflicts)
-                        else: penalty += HARD_PENALTY
-                    if other_event["Teacher"] == event["Teacher"]:
-                        penalty += HARD_PENALTY
+
+    def check_event_hard_constraints(self, event, state, room, timeslot, weekday, room_conflicts = None):
+        if timeslot is None or weekday is None or room is None: return HARD_PENALTY
+
+        penalty = self.check_event_unavailability_constraints(event, state, timeslot, weekday)
+
+        course = state.course[event]
+        conflict_weights = self.conflict_weights[event]
+        other_course_in_room = same_course_in_room = False
+        for other_event in state.events_at(weekday, timeslot):
+            if other_event == event: continue
+            penalty += conflict_weights.get(other_event, 0)
+            if state.room[other_event] == room:
+                if state.course[other_event] == course: same_course_in_room = True
+                else: other_course_in_room = True
+        if other_course_in_room and not same_course_in_room: # same course lectures were already counted
+            if room_conflicts is not None: self.room_conflicts(state, event, room, timeslot, weekday, room_conflicts)
+            else: penalty += HARD_PENALTY
         return penalty
-    
 
-    def check_event_unavailability_constraints(self, event, timeslot, weekday):
-        penalty = 0
-        event_constraints = self.constraints.get(event["Name"], [])
 
-        for constraint in event_constraints:
-            if self.check_conflict_time(constraint, timeslot, weekday):
-                penalty += HARD_PENALTY
-        return penalty
-    
-
-    def check_block_constraints(self, event, other_events, timeslot, weekday):
-        conflict = set()
-        for block in self.blocks:
-            if event["Name"] in block["Events"]:
-                for e_name in block["Events"]:
-                    evs = self.name_to_event_ids.get(e_name)
-                    for ev in evs:
-                        ev = other_events.get(ev)
-                        if ev is not None and ev["Id"] != event["Id"] and self.check_conflict_time(ev, timeslot, weekday):
-                            conflict.add((event["Id"], ev["Id"]))
-        return len(conflict)
-    
-
-    def check_room_conflicts(self, room_conflicts):
+    def check_event_unavailability_constraints(self, event, state, timeslot, weekday):
+        if self.course_unavailable[state.course[event]] >> (weekday * state.periods_per_day + timeslot) & 1:
+            return HARD_PENALTY
+        return 0
+
+
+    def check_room_conflicts(self, room_conflicts): # a room holds one course per period, each further course is a clash
         penalty = 0
-        for room_penalty in room_conflicts.values():
-            penalty += room_penalty
+        for courses in room_conflicts.values():
+            penalty += (len(courses) - 1) * HARD_PENALTY
         return penalty
-    
 
-    def room_conflicts(self, other_event, room_conflicts):
-            conflict_key = (other_event['Id'], other_event['RoomId'], other_event["WeekDay"], other_event["Timeslot"])
-            if conflict_key not in room_conflicts:
-                room_conflicts[conflict_key] = HARD_PENALTY
+
+    def room_conflicts(self, state, event, room, timeslot, weekday, room_conflicts):
+            courses = room_conflicts.setdefault((room, weekday, timeslot), set())
+            courses.add(state.course[event])
+            courses.update(state.course[other_event] for other_event in state.events_at(weekday, timeslot) if state.room[other_event] == room)
 
 
     # Soft Constraints:
 
 
-    def check_min_working_days(self, event, events, weekday):
-        evs = self.name_to_event_ids.get(event["Name"])
+    def check_min_working_days(self, event, state, weekday):
+        course = state.course[event]
         event_days = set()
-        for ev in evs:
-            ev = events.get(ev, None)
-            if ev is not None and ev["WeekDay"] is not None and ev["Id"] != event["Id"]:
-                event_days.add(ev["WeekDay"])
+        for ev in self.course_events[course]:
+            if ev != event and state.weekday[ev] >= 0:
+                event_days.add(state.weekday[ev])
 
         if weekday is not None:
             event_days.add(weekday)
-        if len(event_days) < event["MinWorkingDays"]:
-            return (event["MinWorkingDays"] - len(event_days)) * MIN_WORKING_DAYS_PENALTY
+        if len(event_days) < self.course_min_days[course]:
+            return (self.course_min_days[course] - len(event_days)) * MIN_WORKING_DAYS_PENALTY
         return 0
-    
 
-    def check_block_compactness(self, event, other_events, timeslot, weekday):
+
+    def check_block_compactness(self, event, state, timeslot, weekday):
         if weekday is None or timeslot is None: return 0
         penalty = 0
-        
-        for block in self.blocks:
-            if event["Name"] in block["Events"]:
-                adjacent_found = False
-
-                for e_name in block["Events"]:
-                    evs = self.name_to_event_ids.get(e_name)
-                    for ev in evs:
-                        ev = other_events.get(ev)
-                        if ev is not None and ev["Id"] != event["Id"]:
-                            if ev["Id"] == event["Id"] or ev["WeekDay"] is None or ev["Timeslot"] is None:
-                                continue
-                            if ev["WeekDay"] == weekday and abs(timeslot - ev["Timeslot"]) == 1:
-                                adjacent_found = True
-                                break
-                    
-                    if adjacent_found:
-                        break
-                
-                if not adjacent_found:
-                    penalty += CURRICULUM_COMPACTNESS_PENALTY
+
+        adjacent_curricula = set()
+        for adjacent_timeslot in (timeslot - 1, timeslot + 1):
+            if 0 <= adjacent_timeslot < state.periods_per_day:
+                for ev in state.events_at(weekday, adjacent_timeslot):
+                    if ev != event: adjacent_curricula.update(self.course_curricula[state.course[ev]])
+
+        for curriculum in self.course_curricula[state.course[event]]:
+            if curriculum not in adjacent_curricula:
+                penalty += CURRICULUM_COMPACTNESS_PENALTY
         return penalty
 
-    
-    def check_room_stability(self, event, other_events, room_id):
-        if room_id is None: return 0
+
+    def check_room_stability(self, event, state, room):
+        if room is None: return 0
         different_rooms = set()
-        evs = self.name_to_event_ids.get(event["Name"])
 
-        for ev in evs:
-            ev = other_events.get(ev)
-            if ev is not None and ev["RoomId"] is not None and ev["Id"] != event["Id"] and ev["RoomId"] != room_id:
-                different_rooms.add(ev["RoomId"])
+        for ev in self.course_events[state.course[event]]:
+            if state.room[ev] >= 0 and ev != event and state.room[ev] != room:
+                different_rooms.add(state.room[ev])
         return len(different_rooms)
-    
-    
-    def check_room_capacity(self, event, room_id):
-        room = self.rooms.get(room_id)
+
+
+    def check_room_capacity(self, event, room):
         if room is None: return 0
-        if room["Capacity"] < event["Capacity"]:
-            return event["Capacity"] - room["Capacity"]
-        return 0
\ No newline at end of file
+        if self.room_capacity[room] < self.capacity[event]:
+            return self.capacity[event] - self.room_capacity[room]
+        return 0
@@ -0,0 +1,130 @@
+from algorithm.macros import DIVING
+from algorithm.simulation_results_writer import directory_exists
+from array import array
+import os
+import pickle
+import random
+
+CHECKPOINT_VERSION = 1
+
+def checkpoint_filename(output_filename, checkpoint_dir = "checkpoint"):
+    _, tail = os.path.split(output_filename)
+    return os.path.join(checkpoint_dir, f"{tail.split('_')[0]}_checkpoint.pkl")
+
+
+def pack_tree(root, marked_nodes = ()):
+    # Typed columns in preorder, each node pointing to its parent's position. Children that were never
+    # backpropagated (added by an interrupted iteration) are left out, so their expansion is simply done again.
+    # Pruned expansions are only counted. Returns the columns and the positions of the marked nodes.
+    columns = {
+        "parent": array('i'), "expanded": array('i'), "expansion_limit": array('i'), "visits": array('i'),
+        "score_hard": array('d'), "score_soft": array('d'), "best_hard": array('d'), "best_soft": array('d'),
+        "event": array('h'), "weekday": array('h'), "timeslot": array('h'), "room": array('h')
+    }
+    marked_positions = {}
+    stack = [(root, -1)]
+    while stack:
+        node, parent = stack.pop()
+        position = len(columns["parent"])
+        if node in marked_nodes: marked_positions[node] = position
+
+        children = [child for child in node.children if child and child.visits > 0]
+        skipped = sum(1 for child in node.children if child and child.visits == 0)
+        event, weekday, timeslot, room = node.assignment if node.assignment is not None else (-1, -1, -1, -1)
+        for name, value in (("parent", parent), ("expanded", node.expanded() - skipped), ("expansion_limit", node.expansion_limit),
+                            ("visits", node.visits), ("score_hard", node.score_hard), ("score_soft", node.score_soft),
+                            ("best_hard", node.best_hard_penalty), ("best_soft", node.best_soft_penalty),
+                            ("event", event), ("weekday", weekday), ("timeslot", timeslot), ("room", room)):
+            columns[name].append(value)
+
+        stack.extend((child, position) for child in reversed(children))
+    return columns, marked_positions
+
+
+def unpack_tree(columns, root): # rebuilds the packed tree under an empty root, returns the nodes by position
+    nodes = []
+    real_children = []
+    for position in range(len(columns["parent"])):
+        parent = columns["parent"][position]
+        if parent == -1:
+            node = root
+            node.expansion_limit = columns["expansion_limit"][position]
+        else:
+            assignment = (columns["event"][position], columns["weekday"][position], columns["timeslot"][position], columns["room"][position])
+            node = nodes[parent].add_child(columns["expansion_limit"][position], assignment)
+            real_children[parent] += 1
+        node.visits = columns["visits"][position]
+        node.score_hard = columns["score_hard"][position]
+        node.score_soft = columns["score_soft"][position]
+        node.best_hard_penalty = columns["best_hard"][position]
+        node.best_soft_penalty = columns["best_soft"][position]
+        nodes.append(node)
+        real_children.append(0)
+
+    for position, node in enumerate(nodes): # pruned expansions go after the real children, only their number matters
+        for _ in range(columns["expanded"][position] - real_children[position]):
+            node.add_pruned_child()
+    return nodes
+
+
+def save_checkpoint(mcts, filename, iteration, elapsed):
+    best_nodes = mcts.best_node if DIVING else []
+    tree, marked_positions = pack_tree(mcts.root, set(best_nodes))
+    diving = None
+    if DIVING and all(node in marked_positions for node in best_nodes): # otherwise diving starts over
+        diving = (mcts.simulation_path, [marked_positions[node] for node in best_nodes], mcts.is_current_node_fully_expanded)
+
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "event_order": array('h', (event["Id"] for event in mcts.events)),
+        "priorities": [event["Priority"] for event in mcts.events],
+        "tree": tree,
+        "penalties": (mcts.global_best_hard_penalty, mcts.global_best_soft_penalty, mcts.worst_hard_penalty, mcts.worst_soft_penalty, mcts.best_soft_penalty),
+        "previous_unassigned_events": sorted(mcts.previous_unassigned_events),
+        "diving": diving,
+        "iteration": iteration,
+        "simulations": mcts.simulations,
+        "elapsed": elapsed,
+        "random_state": random.getstate(),
+        "metrics": getattr(mcts, "metrics", None), # only kept with DEBUG_PROGRESS
+        "neighborhood_selector": mcts.hill_climber.selector # learned weights and counters
+    }
+
+    directory_exists(os.path.dirname(filename) or ".")
+    temporary_filename = f"{filename}.tmp"
+    with open(temporary_filename, "wb") as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_filename, filename)
+
+
+def load_checkpoint(mcts, filename): # restores a freshly built MCTS on the same instance to the checkpointed search
+    with open(filename, "rb") as file:
+        checkpoint = pickle.load(file)
+
+    events_by_id = {event["Id"]: event for event in mcts.events}
+    if checkpoint.get("version") != CHECKPOINT_VERSION or sorted(checkpoint["event_order"]) != sorted(events_by_id):
+        raise ValueError(f"Checkpoint '{filename}' does not match this version or this instance")
+
+    mcts.events = [events_by_id[event_id] for event_id in checkpoint["event_order"]] # tree depths index this order
+    for event, priority in zip(mcts.events, checkpoint["priorities"]):
+        event["Priority"] = priority
+
+    nodes = unpack_tree(checkpoint["tree"], mcts.root)
+    mcts.current_node = mcts.root
+    (mcts.global_best_hard_penalty, mcts.global_best_soft_penalty, mcts.worst_hard_penalty,
+     mcts.worst_soft_penalty, mcts.best_soft_penalty) = checkpoint["penalties"]
+    mcts.previous_unassigned_events = set(checkpoint["previous_unassigned_events"])
+
+    if DIVING and checkpoint["diving"] is not None:
+        simulation_path, best_positions, mcts.is_current_node_fully_expanded = checkpoint["diving"]
+        mcts.simulation_path = simulation_path
+        mcts.best_node = [nodes[position] for position in best_positions]
+
+    mcts.iteration = checkpoint["iteration"]
+    mcts.simulations = checkpoint["simulations"]
+    mcts.elapsed = checkpoint["elapsed"]
+    if checkpoint["metrics"] is not None: mcts.metrics = checkpoint["metrics"]
+    selector = checkpoint.get("neighborhood_selector")
+    if selector is not None and selector.names == mcts.hill_climber.selector.names:
+        mcts.hill_climber.selector = selector
+    random.setstate(checkpoint["random_state"])
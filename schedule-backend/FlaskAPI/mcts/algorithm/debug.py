@@ -1,33 +1,38 @@
 from algorithm.macros import WAIT_TIME, MAX_RETRIES
-from algorithm.simulation_results_writer import directory_exists
+from algorithm.simulation_results_writer import directory_exists, read_last_progress_record
+from algorithm.tree_export import export_tree
 import graphviz
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 import os
 import openpyxl
 from openpyxl.styles import Font
-import re
 import time
 import io, pstats
 
-def visualize_tree(root, output_file_name = "mcts_tree"):
-    print("Processing the tree...")
-    dot = graphviz.Digraph(comment = 'MCTS Tree')
+def save_tree(root, output_file_name = "mcts_tree.csv"):
+    print("Exporting the tree...")
+    output_dir = "mcts_tree"
+    directory_exists(output_dir)
+    output_file_name = os.path.join(output_dir, output_file_name)
 
-    def add_nodes_edges(node):
-        if not node: return
-        label = f"{node.assignment} {node.best_hard_penalty} {node.best_soft_penalty}" #{node.expansion_limit}"
-        dot.node(str(id(node)), label=label, shape="plaintext", width="0.01", height="0.01")
-        #label = ""
-        #dot.node(str(id(node)), label=label, shape="point", width="0.01", height="0.01")
+    count = export_tree(root, output_file_name)
+    print(f"Tree with {count} nodes saved to {output_file_name}\n")
 
-        for child in node.children:
-            if child:
-                dot.edge(str(id(node)), str(id(child)), dir="none", style="solid", penwidth="0.5")
-                add_nodes_edges(child)
+
+def visualize_tree(nodes, output_file_name = "mcts_tree"): # nodes as loaded from a tree export, by id
+    print("Processing the tree...")
+    dot = graphviz.Digraph(comment = 'MCTS Tree')
 
     try:
-        add_nodes_edges(root)
+        for node_id, node in nodes.items():
+            assignment = f"({node['event']}, {node['weekday']}, {node['timeslot']}, {node['room']})" if node["event"] else "root"
+            label = f"{assignment} {node['visits']} {node['best_hard']} {node['best_soft']}" #{node['expansion_limit']}"
+            dot.node(str(node_id), label=label, shape="plaintext", width="0.01", height="0.01")
+            #label = ""
+            #dot.node(str(node_id), label=label, shape="point", width="0.01", height="0.01")
+            if node["parent"] != "-1":
+                dot.edge(node["parent"], str(node_id), dir="none", style="solid", penwidth="0.5")
 
         output_dir = "mcts_tree"
         directory_exists(output_dir)
@@ -71,6 +76,15 @@ def plot_progress(metrics, output_file_name = "constraint_progress.html"):
     print(f"Plot saved successfully to {output_file_name}\n")
 
 
+def save_progress(metrics, output_file_name = "constraint_progress.csv"):
+    output_dir = "constraint_progress"
+    directory_exists(output_dir)
+    output_file_name = os.path.join(output_dir, output_file_name)
+
+    metrics.save(output_file_name)
+    print(f"Progress metrics saved to {output_file_name}")
+
+
 def save_results_to_excel(results, file_names, filename="test_results.xlsx"):
     print(f"Saving results to excel...")
     
@@ -88,13 +102,15 @@ def save_results_to_excel(results, file_names, filename="test_results.xlsx"):
             header = ["TEST"] + file_names
             ws.append(header)
 
-            def get_value(file, index):
-                return results[file][index] if file in results and len(results[file]) > index else "N/A"
+            def get_value(file, key):
+                return results[file][key] if results.get(file) else "N/A"
             
-            best_hard_row = ["Time"] + [get_value(file, 0) for file in file_names]
-            best_soft_row = ["Hard"] + [get_value(file, 1) for file in file_names]
-            iteration_row = ["Soft"] + [get_value(file, 2) for file in file_names]
+            time_row = ["Time (s)"] + [get_value(file, "elapsed") for file in file_names]
+            best_hard_row = ["Hard"] + [get_value(file, "hard") for file in file_names]
+            best_soft_row = ["Soft"] + [get_value(file, "soft") for file in file_names]
+            iteration_row = ["Iteration"] + [get_value(file, "iteration") for file in file_names]
 
+            ws.append(time_row)
             ws.append(best_hard_row)
             ws.append(best_soft_row)
             ws.append(iteration_row)
@@ -111,35 +127,10 @@ def save_results_to_excel(results, file_names, filename="test_results.xlsx"):
             time.sleep(WAIT_TIME)
 
 
-def parse_last_log_line(line):
-    match = re.search(r"Time: ([\d:.]+), Hard: (-?\d+), Soft: (-?\d+)", line)
-    if match:
-        time_value = match.group(1)
-        hard_value = int(match.group(2))
-        soft_value = int(match.group(3))
-        return [time_value, hard_value, soft_value]
-    return None
+def get_last_log_record(filename):
+    return read_last_progress_record(filename)
 
 
-def get_last_log_line(filename):
-    try:
-        with open(filename, 'rb') as f:
-            f.seek(0, os.SEEK_END)
-            if f.tell() == 0:
-                return ""
-            
-            f.seek(-2, os.SEEK_END)
-            while f.read(1) != b'\n':
-                f.seek(-2, os.SEEK_CUR)
-            return parse_last_log_line(f.readline().decode())
-    except FileNotFoundError:
-        return "File not found"
-    except OSError:
-        with open(filename, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            return parse_last_log_line(lines[-1]) if lines else ""
-        
-
 def profile_execution(profiler, input_file_name):
         profiler.disable()
         
@@ -1,152 +1,152 @@
 import random, time
-from algorithm.utils import find_available_rooms, dict_slice
-from algorithm.simulation_results_writer import write_simulation_results
 from algorithm.macros import HC_IDLE
+from algorithm.neighborhood_selector import NeighborhoodSelector
+
+class Move:
+
+    # The changes made by a neighbourhood, with their exact penalty deltas as reported by the state's incremental
+    # evaluator, and an undo log of the previous positions, so a rejected move only touches the events it moved
+    __slots__ = ("state", "undo_log", "hard_delta", "soft_delta")
+
+    def __init__(self, state):
+        self.state = state
+        self.undo_log = []
+        self.hard_delta = 0
+        self.soft_delta = 0
+
+
+    def apply(self, event, room, weekday, timeslot):
+        state = self.state
+        self.undo_log.append((event, state.room[event], state.weekday[event], state.timeslot[event]))
+        hard_delta, soft_delta = state.move(event, room, weekday, timeslot)
+        self.hard_delta += hard_delta
+        self.soft_delta += soft_delta
+
+
+    def revert(self):
+        state = self.state
+        while self.undo_log:
+            state.move(*self.undo_log.pop())
+        self.hard_delta = self.soft_delta = 0
+
 
 class HillClimbing:
 
-    def __init__(self, conflicts_checker, blocks, rooms, days, name_to_event_ids, output_filename="output/output.txt"):
-        self.blocks = blocks.values()
-        self.rooms = rooms
+    # The state must have an IncrementalEvaluator attached, the moves are evaluated from its penalty deltas
+    def __init__(self, conflicts_checker, events, days, writer):
         self.conflicts_checker = conflicts_checker
+        self.events = sorted(events, key=lambda event: event["Id"])
         self.days = days
-        self.name_to_event_ids = name_to_event_ids
-        self.output_filename = output_filename
+        self.writer = writer
         self.best_result_soft = float('-inf')
-        self.original_state = {}
-
-
-    def evaluate_timetable(self, simulated_events):
-        soft_penalty = 0
-        event_names = []
-
-        for event in simulated_events.values():
-            soft_penalty += (
-                self.conflicts_checker.check_room_capacity(event, event["RoomId"]) +
-                self.conflicts_checker.check_block_compactness(event, simulated_events, event["Timeslot"], event["WeekDay"])
-            )
-            if event["Name"] not in event_names:
-                events_to_check = dict_slice(simulated_events, event["Id"], True)
-                soft_penalty += (
-                    self.conflicts_checker.check_min_working_days(event, events_to_check, event["WeekDay"]) +
-                    self.conflicts_checker.check_room_stability(event, events_to_check, event["RoomId"])
-                )
-            if -soft_penalty <= self.best_result_soft: return None
-            event_names.append(event["Name"])
-        return -soft_penalty
-    
-
-    def revert_changes(self, timetable):
-        if not self.original_state: return
-        for event_id, original_state in self.original_state.items():
-            event = timetable.get(event_id)
-            if event:
-                event.update(original_state)
-        self.original_state.clear()
-      
-
-    def save_original_state(self, event):
-        self.original_state[event["Id"]] = {"WeekDay": event["WeekDay"],"Timeslot": event["Timeslot"], "RoomId": event["RoomId"]}
-
-
-    def period_move(self, timetable, unscheduled_events):
-        random_event = random.choice(list(unscheduled_events.values()))
-
-        for new_period in random_event["Available_Periods"]:
+        self.unscheduled = set()
+        neighborhoods = [(self.period_move,1), (self.room_move,1), (self.event_move,1), (self.room_stability_move,0.7), (self.min_working_days_move,0.5), (self.curriculum_compactness_move,0.7), (self.swap_move,1), (self.kempe_move,1)]
+        self.neighborhoods = [neighborhood for neighborhood, _ in neighborhoods]
+        self.selector = NeighborhoodSelector([neighborhood.__name__ for neighborhood in self.neighborhoods], [weight for _, weight in neighborhoods])
+        self.neighborhood = None # index of the neighbourhood of the last move, for its reward
+
+
+    def random_move(self, state, unscheduled_events):
+        self.neighborhood = self.selector.choose()
+        start = time.process_time()
+        move = self.neighborhoods[self.neighborhood](state, unscheduled_events)
+        self.selector.record(self.neighborhood, time.process_time() - start)
+        return move
+
+
+    def period_move(self, state, unscheduled_events):
+        random_event = random.choice(unscheduled_events)
+        room = state.room[random_event]
+
+        for new_period in self.events[random_event]["Available_Periods"]:
             new_weekday, new_timeslot = new_period
-            if new_period != (random_event["WeekDay"], random_event["Timeslot"]) and self.conflicts_checker.check_event_hard_constraints(random_event, timetable, random_event["RoomId"], new_timeslot, new_weekday) == 0:
-                self.save_original_state(random_event)
-                random_event["WeekDay"], random_event["Timeslot"] = new_weekday, new_timeslot
-                return timetable
+            if new_period != (state.weekday[random_event], state.timeslot[random_event]) and self.conflicts_checker.check_event_hard_constraints(random_event, state, room, new_timeslot, new_weekday) == 0:
+                move = Move(state)
+                move.apply(random_event, room, new_weekday, new_timeslot)
+                return move
         return None
 
 
-    def room_move(self, timetable, unscheduled_events):
-        random_event = random.choice(list(unscheduled_events.values()))
+    def room_move(self, state, unscheduled_events):
+        random_event = random.choice(unscheduled_events)
+        weekday, timeslot = state.weekday[random_event], state.timeslot[random_event]
 
-        available_rooms = find_available_rooms(random_event["Capacity"], self.rooms, timetable.values(), [(random_event["WeekDay"], random_event["Timeslot"])])
-        available_rooms_list = list(available_rooms.values())
-        if available_rooms_list != [set()]:
-            for new_room in list(available_rooms_list[0]):
-                if new_room != random_event["RoomId"] and self.conflicts_checker.check_event_hard_constraints(random_event, timetable, new_room, random_event["Timeslot"], random_event["WeekDay"]) == 0:
-                    self.save_original_state(random_event)
-                    random_event["RoomId"] = new_room
-                    return timetable
+        available_rooms = state.occupancy.available_rooms(state.capacity[random_event], [(weekday, timeslot)])
+        for new_room in available_rooms[(weekday, timeslot)]:
+            if new_room != state.room[random_event] and self.conflicts_checker.check_event_hard_constraints(random_event, state, new_room, timeslot, weekday) == 0:
+                move = Move(state)
+                move.apply(random_event, new_room, weekday, timeslot)
+                return move
         return None
 
 
-    def event_move(self, timetable, unscheduled_events):
-        random_event = random.choice(list(unscheduled_events.values()))
+    def event_move(self, state, unscheduled_events):
+        random_event = random.choice(unscheduled_events)
+        move = Move(state)
+
+        for new_weekday, new_timeslot in self.events[random_event]["Available_Periods"]:
+            if (new_weekday, new_timeslot) == (state.weekday[random_event], state.timeslot[random_event]): continue
+            available_rooms = state.occupancy.available_rooms(state.capacity[random_event], [(new_weekday, new_timeslot)])
 
-        for new_weekday, new_timeslot in random_event["Available_Periods"]:
-            if (new_weekday, new_timeslot) == (random_event["WeekDay"], random_event["Timeslot"]): continue
-            available_rooms = find_available_rooms(random_event["Capacity"], self.rooms, timetable.values(), [(new_weekday, new_timeslot)])
-            available_rooms_list = list(available_rooms.values())
-            if available_rooms_list == [set()]: continue
+            for new_room in available_rooms[(new_weekday, new_timeslot)]:
+                if new_room == state.room[random_event]: continue
+                original_weekday, original_timeslot, original_room = state.weekday[random_event], state.timeslot[random_event], state.room[random_event]
+                if self.conflicts_checker.check_event_hard_constraints(random_event, state, new_room, new_timeslot, new_weekday) == 0:
+                    move.apply(random_event, new_room, new_weekday, new_timeslot)
 
-            for new_room in list(available_rooms_list[0]):
-                if new_room == random_event["RoomId"]: continue
-                original_weekday, original_timeslot, original_room = random_event["WeekDay"], random_event["Timeslot"], random_event["RoomId"]
-                self.save_original_state(random_event)
-                if self.conflicts_checker.check_event_hard_constraints(random_event, timetable, new_room, new_timeslot, new_weekday) == 0:
-                    random_event["WeekDay"], random_event["Timeslot"], random_event["RoomId"] = new_weekday, new_timeslot, new_room
+                weekday, timeslot, room = state.weekday[random_event], state.timeslot[random_event], state.room[random_event]
+                conflict_event = min((
+                    event for event in state.events_at(weekday, timeslot)
+                    if event != random_event and (state.room[event] == room or state.teacher[event] == state.teacher[random_event])
+                ), default=None)
 
-                conflict_event = None
-                for event in timetable.values():
-                    if event["Id"] != random_event["Id"] and (event["WeekDay"] == random_event["WeekDay"] and event["Timeslot"] == random_event["Timeslot"] and (event["RoomId"] == random_event["RoomId"] or event["Teacher"] == random_event["Teacher"])):
-                        conflict_event = event
-                        break
+                if conflict_event is None:
+                    return move
 
-                if not conflict_event:
-                    return timetable
+                move.apply(random_event, state.room[conflict_event], state.weekday[conflict_event], state.timeslot[conflict_event])
+                move.apply(conflict_event, original_room, original_weekday, original_timeslot)
 
-                random_event["RoomId"], random_event["Timeslot"], random_event["WeekDay"] = conflict_event["RoomId"], conflict_event["Timeslot"], conflict_event["WeekDay"]
-                conflict_event["RoomId"], conflict_event["Timeslot"], conflict_event["WeekDay"] = original_room, original_timeslot, original_weekday
+                if (self.conflicts_checker.check_event_hard_constraints(random_event, state, state.room[random_event], state.timeslot[random_event], state.weekday[random_event]) == 0 and
+                    self.conflicts_checker.check_event_hard_constraints(conflict_event, state, state.room[conflict_event], state.timeslot[conflict_event], state.weekday[conflict_event]) == 0):
+                    return move
 
-                if (self.conflicts_checker.check_event_hard_constraints(random_event, timetable, random_event["RoomId"], random_event["Timeslot"], random_event["WeekDay"]) == 0 and 
-                    self.conflicts_checker.check_event_hard_constraints(conflict_event, timetable, conflict_event["RoomId"], conflict_event["Timeslot"], conflict_event["WeekDay"]) == 0):
-                    return timetable
-                
-        self.revert_changes(unscheduled_events)
+        move.revert()
         return None
-    
 
-    def room_stability_move(self, timetable, unscheduled_events):
-        random_event = random.choice(list(unscheduled_events.values()))
 
-        course_events = self.name_to_event_ids.get(random_event["Name"])
-        course_events = [unscheduled_events.get(event_id) for event_id in course_events if event_id in unscheduled_events]
+    def room_stability_move(self, state, unscheduled_events):
+        random_event = random.choice(unscheduled_events)
+
+        course_events = [event for event in state.course_events[state.course[random_event]] if event in self.unscheduled]
 
-        if len(course_events) < random_event["Lectures"]: return None
+        if len(course_events) < self.events[random_event]["Lectures"]: return None
 
-        target_room_id = random.choice(list(self.rooms.keys()))
+        target_room = random.randrange(len(state.room_ids))
+        move = Move(state)
         for e in course_events:
-            if e["RoomId"] != target_room_id:
-                if self.conflicts_checker.check_event_hard_constraints(e, timetable, target_room_id, e["Timeslot"], e["WeekDay"]) == 0:
-                    self.save_original_state(e)
-                    e["RoomId"] = target_room_id
+            if state.room[e] != target_room:
+                if self.conflicts_checker.check_event_hard_constraints(e, state, target_room, state.timeslot[e], state.weekday[e]) == 0:
+                    move.apply(e, target_room, state.weekday[e], state.timeslot[e])
                 else:
-                    self.revert_changes(unscheduled_events)
+                    move.revert()
                     return None
 
-        return timetable
+        return move
 
 
-    def curriculum_compactness_move(self, timetable, unscheduled_events):
-        random_block = random.choice(list(self.blocks))
-        
+    def curriculum_compactness_move(self, state, unscheduled_events):
+        random_curriculum = random.randrange(len(state.curriculum_courses))
+
         isolated_events = []
         block_events = []
-        for event_name in random_block["Events"]:
-            evs = self.name_to_event_ids.get(event_name)
-            for ev in evs:
-                ev = timetable.get(ev)
+        for course in state.curriculum_courses[random_curriculum]:
+            for ev in state.course_events[course]:
                 block_events.append(ev)
-                if ev["Id"] in unscheduled_events:
+                if ev in self.unscheduled:
                     isolated_events.append(ev)
-        
+
         for j, event in enumerate(block_events):
-            if j+1 < len(block_events) and event["WeekDay"] == block_events[j+1]["WeekDay"] and abs(ev["Timeslot"] - block_events[j+1]["Timeslot"]) == 1:
+            if j+1 < len(block_events) and state.weekday[event] == state.weekday[block_events[j+1]] and abs(state.timeslot[event] - state.timeslot[block_events[j+1]]) == 1:
                 if event in isolated_events:
                     isolated_events.remove(event)
 
@@ -155,90 +155,157 @@ class HillClimbing:
         event_to_move = random.choice(isolated_events)
 
         available_periods = []
-        for weekday, timeslot in event_to_move["Available_Periods"]:
-            if (weekday, timeslot) != (event_to_move["WeekDay"], event_to_move["Timeslot"]):
-                adjacent_events = [e for e in block_events if e["Id"] != event_to_move["Id"] and e["WeekDay"] == weekday and abs(e["Timeslot"] - timeslot) == 1]
+        for weekday, timeslot in self.events[event_to_move]["Available_Periods"]:
+            if (weekday, timeslot) != (state.weekday[event_to_move], state.timeslot[event_to_move]):
+                adjacent_events = [e for e in block_events if e != event_to_move and state.weekday[e] == weekday and abs(state.timeslot[e] - timeslot) == 1]
                 if adjacent_events:
                     available_periods.append((weekday, timeslot))
 
         if not available_periods: return None
 
         new_weekday, new_timeslot = random.choice(available_periods)
-        available_rooms = find_available_rooms(event_to_move["Capacity"], self.rooms, timetable.values(), [(new_weekday, new_timeslot)])
-
-        available_rooms_list = list(available_rooms.values())
-        if available_rooms_list == [set()]: return None
-        
-        for new_room in list(available_rooms_list[0]):
-            if self.conflicts_checker.check_event_hard_constraints(event_to_move, timetable, new_room, new_timeslot, new_weekday) == 0:
-                self.save_original_state(event_to_move)
-                event_to_move["WeekDay"], event_to_move["Timeslot"], event_to_move["RoomId"] = new_weekday, new_timeslot, new_room
-                return timetable
+        available_rooms = state.occupancy.available_rooms(state.capacity[event_to_move], [(new_weekday, new_timeslot)])
+
+        for new_room in available_rooms[(new_weekday, new_timeslot)]:
+            if self.conflicts_checker.check_event_hard_constraints(event_to_move, state, new_room, new_timeslot, new_weekday) == 0:
+                move = Move(state)
+                move.apply(event_to_move, new_room, new_weekday, new_timeslot)
+                return move
         return None
 
-    
-    def min_working_days_move(self, timetable, unscheduled_events):
+
+    def min_working_days_move(self, state, unscheduled_events):
         penalized_events = [
-            event for event in unscheduled_events.values()
-            if self.conflicts_checker.check_min_working_days(event, timetable, event["WeekDay"]) > 0
+            event for event in unscheduled_events
+            if self.conflicts_checker.check_min_working_days(event, state, state.weekday[event]) > 0
         ]
 
         if not penalized_events: return None
 
         event_to_move = random.choice(penalized_events)
 
-        course = self.name_to_event_ids.get(event_to_move["Name"])
-        taught_days = {timetable.get(event_id)["WeekDay"] for event_id in course}
+        taught_days = {state.weekday[event] for event in state.course_events[state.course[event_to_move]]}
 
         available_days = set(range(self.days)) - taught_days
 
         if not available_days:
             return None
 
-        for new_weekday, new_timeslot in event_to_move["Available_Periods"]:
+        for new_weekday, new_timeslot in self.events[event_to_move]["Available_Periods"]:
             if new_weekday in available_days:
-                available_rooms = find_available_rooms(event_to_move["Capacity"], self.rooms, timetable.values(), [(new_weekday,new_timeslot)])
-                available_rooms_list = list(available_rooms.values())
-                if available_rooms_list == [set()]: return None
-                for new_room in list(available_rooms_list[0]):
-                    if self.conflicts_checker.check_event_hard_constraints(event_to_move, timetable, new_room, new_timeslot, new_weekday) == 0:
-                        self.save_original_state(event_to_move)
-                        event_to_move["WeekDay"], event_to_move["Timeslot"], event_to_move["RoomId"] = new_weekday, new_timeslot, new_room
-                        return timetable
+                available_rooms = state.occupancy.available_rooms(state.capacity[event_to_move], [(new_weekday,new_timeslot)])
+                for new_room in available_rooms[(new_weekday, new_timeslot)]:
+                    if self.conflicts_checker.check_event_hard_constraints(event_to_move, state, new_room, new_timeslot, new_weekday) == 0:
+                        move = Move(state)
+                        move.apply(event_to_move, new_room, new_weekday, new_timeslot)
+                        return move
         return None
 
 
-    def run_hill_climbing(self, best_timetable, start_key, best_result_soft, start_time, time_limit):
-        self.best_result_soft = best_result_soft
+    def has_conflict(self, state, event, period, ignored_event):
+        conflict_weights = self.conflicts_checker.conflict_weights[event]
+        return any(other_event != ignored_event and other_event in conflict_weights for other_event in state.period_events[period])
+
+
+    def swap_move(self, state, unscheduled_events): # two events of different periods exchange their periods and rooms
+        event, other_event = random.choice(unscheduled_events), random.choice(unscheduled_events)
+        period = state.weekday[event] * state.periods_per_day + state.timeslot[event]
+        other_period = state.weekday[other_event] * state.periods_per_day + state.timeslot[other_event]
+        if period == other_period: return None
+
+        if state.course_unavailable[state.course[event]] >> other_period & 1 or state.course_unavailable[state.course[other_event]] >> period & 1: return None
+        if self.has_conflict(state, event, other_period, other_event) or self.has_conflict(state, other_event, period, event): return None
+
+        room, weekday, timeslot = state.room[event], state.weekday[event], state.timeslot[event]
+        move = Move(state)
+        move.apply(event, state.room[other_event], state.weekday[other_event], state.timeslot[other_event])
+        move.apply(other_event, room, weekday, timeslot)
+        return move
+
+
+    def kempe_chain(self, state, event, periods):
+        # The events of the two periods connected to `event` through the conflict graph, each with the index in
+        # `periods` of the period it moves to. Swapping the whole chain keeps both periods free of conflicts.
+        chain = {event: 1}
+        stack = [event]
+        while stack:
+            current = stack.pop()
+            target = chain[current]
+            conflict_weights = self.conflicts_checker.conflict_weights[current]
+            for other_event in state.period_events[periods[target]]:
+                if other_event not in chain and other_event in conflict_weights:
+                    chain[other_event] = 1 - target
+                    stack.append(other_event)
+        return chain
+
+
+    def chain_rooms(self, state, periods, chain):
+        # Room for each event of the chain in its new period: its own room if still free there, otherwise the free
+        # room that suits its size best. None if an event is unavailable, fixed by the tree or left without a room.
+        targets = []
+        for target, period in enumerate(periods):
+            used = 0
+            for other_event in state.period_events[period]:
+                if other_event not in chain: used |= 1 << state.room[other_event]
+
+            incoming = [event for event, event_target in chain.items() if event_target == target]
+            homeless = []
+            for event in incoming:
+                if event not in self.unscheduled or state.course_unavailable[state.course[event]] >> period & 1: return None
+                if used & (1 << state.room[event]):
+                    homeless.append(event)
+                else:
+                    used |= 1 << state.room[event]
+                    targets.append((event, state.room[event], period))
+
+            for event in homeless:
+                _, suitable, fallback = state.occupancy.room_order(state.capacity[event])
+                room = next((room for bit, room in suitable if not used & bit), None)
+                if room is None: room = next((room for bit, room in fallback if not used & bit), None)
+                if room is None: return None
+                used |= 1 << room
+                targets.append((event, room, period))
+        return targets
 
-        neighborhoods = [(self.period_move,1), (self.room_move,1), (self.event_move,1), (self.room_stability_move,0.7), (self.min_working_days_move,0.5), (self.curriculum_compactness_move,0.7)]
+
+    def kempe_move(self, state, unscheduled_events):
+        event = random.choice(unscheduled_events)
+        weekday, timeslot = random.choice(self.events[event]["Available_Periods"])
+        periods = (state.weekday[event] * state.periods_per_day + state.timeslot[event], weekday * state.periods_per_day + timeslot)
+        if periods[0] == periods[1]: return None
+
+        targets = self.chain_rooms(state, periods, self.kempe_chain(state, event, periods))
+        if targets is None: return None
+
+        move = Move(state)
+        for chain_event, room, period in targets:
+            move.apply(chain_event, room, *divmod(period, state.periods_per_day))
+        return move
+
+
+    def run_hill_climbing(self, state, unscheduled_events, best_result_soft, start_time, time_limit):
+        self.best_result_soft = best_result_soft
+        self.unscheduled = set(unscheduled_events)
 
         idle_iterations = 0
 
         while idle_iterations < HC_IDLE and (time.time() - start_time <= time_limit):
-            current_neighborhood, _ = random.choices(neighborhoods, weights=[weight for _, weight in neighborhoods], k=1)[0]
-            unscheduled_events = dict_slice(best_timetable, start_key)
-            modified_timetable = current_neighborhood(best_timetable, unscheduled_events)
+            move = self.random_move(state, unscheduled_events)
 
-            if not modified_timetable:
+            if move is None:
                 idle_iterations += 1
                 continue
 
-            result = self.evaluate_timetable(modified_timetable)
+            result = -state.evaluator.soft_penalty
 
-            if result is not None:
-                if result > self.best_result_soft:
-                    #if DEBUG_PRINT: print(f"({current_neighborhood.__name__}): {self.best_result_soft} -> {result}")
-                    self.best_result_soft = result
-                    best_timetable = modified_timetable
-                    write_simulation_results(self.output_filename, best_timetable.values(), start_time, 0, result)
-                    if result == 0: return 0
-                    idle_iterations = 0
-                else:
-                    self.revert_changes(best_timetable)
-                    idle_iterations += 1
+            if move.hard_delta == 0 and result > self.best_result_soft:
+                self.selector.reward(self.neighborhood, result - self.best_result_soft)
+                self.best_result_soft = result
+                self.writer.submit(state, start_time, 0, result, "hill_climbing")
+                if result == 0: return 0
+                idle_iterations = 0
             else:
-                self.revert_changes(best_timetable)
+                move.revert()
                 idle_iterations += 1
 
-        return self.best_result_soft, best_timetable
+        return self.best_result_soft
@@ -0,0 +1,142 @@
+from algorithm.utils import evaluate_timetable
+from algorithm.macros import HARD_PENALTY, MIN_WORKING_DAYS_PENALTY, CURRICULUM_COMPACTNESS_PENALTY
+
+class IncrementalEvaluator:
+
+    def __init__(self, state):
+        self.state = state
+        self.neighbours = [
+            sorted({other for curriculum in curricula for other in state.curriculum_courses[curriculum] if other != course})
+            for course, curricula in enumerate(state.course_curricula)
+        ]
+
+        self.reset()
+
+
+    def reset(self):
+        state = self.state
+        num_periods = state.num_periods
+        num_courses = len(state.course_names)
+        self.hard_penalty = 0
+        self.soft_penalty = 0
+
+        self.course_period = [0] * (num_courses * num_periods)
+        self.teacher_period = [0] * (len(state.teacher_index) * num_periods)
+        self.room_courses = [0] * (len(state.room_ids) * num_periods) # distinct courses with lectures in the room
+        self.course_room_period = [0] * (num_courses * len(state.room_ids) * num_periods)
+        self.curriculum_period = [0] * (len(state.curriculum_courses) * num_periods)
+
+        self.course_days = [0] * (num_courses * state.days)
+        self.course_rooms = [0] * (num_courses * len(state.room_ids))
+        self.course_day_count = [0] * num_courses
+        self.course_room_count = [0] * num_courses
+        self.course_assigned = [0] * num_courses
+
+
+    def penalties(self, unassigned_events = ()):
+        return -(self.hard_penalty + len(unassigned_events)), -self.soft_penalty
+
+
+    def _update(self, event_id, room, weekday, timeslot, step):
+        state = self.state
+        num_periods = state.num_periods
+        period = weekday * state.periods_per_day + timeslot
+        course = state.course[event_id]
+
+        self.course_period[course * num_periods + period] += step
+        self.teacher_period[state.teacher[event_id] * num_periods + period] += step
+        room_period = room * num_periods + period
+        course_room_period = course * len(state.room_ids) * num_periods + room_period
+        self.course_room_period[course_room_period] += step
+        if self.course_room_period[course_room_period] == (1 if step > 0 else 0):
+            self.room_courses[room_period] += step
+        for curriculum in state.course_curricula[course]:
+            self.curriculum_period[curriculum * num_periods + period] += step
+
+        self.course_assigned[course] += step
+
+        day = course * state.days + weekday
+        self.course_days[day] += step
+        if self.course_days[day] == (1 if step > 0 else 0):
+            self.course_day_count[course] += step
+
+        course_room = course * len(state.room_ids) + room
+        self.course_rooms[course_room] += step
+        if self.course_rooms[course_room] == (1 if step > 0 else 0):
+            self.course_room_count[course] += step
+
+
+    # Deltas of adding the event to the counters, which must not include it yet:
+
+    def _hard_delta(self, event_id, room, weekday, timeslot):
+        state = self.state
+        num_periods = state.num_periods
+        period = weekday * state.periods_per_day + timeslot
+        course = state.course[event_id]
+        same_course = self.course_period[course * num_periods + period]
+
+        penalty = state.course_unavailable[course] >> period & 1
+        penalty += same_course * (2 if state.course_curricula[course] else 1)
+        penalty += self.teacher_period[state.teacher[event_id] * num_periods + period] - same_course
+        penalty += sum(self.course_period[other * num_periods + period] for other in self.neighbours[course])
+        room_period = room * num_periods + period
+        if self.room_courses[room_period] > 0 and self.course_room_period[course * len(state.room_ids) * num_periods + room_period] == 0:
+            penalty += 1 # each further course in the room is a clash, lectures of the same course are conflicts
+        return penalty * HARD_PENALTY
+
+
+    def _soft_delta(self, event_id, room, weekday, timeslot):
+        state = self.state
+        num_periods = state.num_periods
+        period = weekday * state.periods_per_day + timeslot
+        course = state.course[event_id]
+        penalty = max(0, state.capacity[event_id] - state.room_capacity[room])
+
+        for curriculum in state.course_curricula[course]:
+            counts = self.curriculum_period
+            base = curriculum * num_periods + period
+            before = counts[base - 1] if timeslot > 0 else 0
+            after = counts[base + 1] if timeslot + 1 < state.periods_per_day else 0
+            if before == 0 and after == 0:
+                penalty += CURRICULUM_COMPACTNESS_PENALTY
+            if counts[base] == 0: # adjacent lectures that were isolated are not anymore
+                if before > 0 and (timeslot < 2 or counts[base - 2] == 0):
+                    penalty -= before * CURRICULUM_COMPACTNESS_PENALTY
+                if after > 0 and (timeslot + 2 >= state.periods_per_day or counts[base + 2] == 0):
+                    penalty -= after * CURRICULUM_COMPACTNESS_PENALTY
+
+        min_days = state.course_min_days[course]
+        days = self.course_day_count[course]
+        new_days = days + (self.course_days[course * state.days + weekday] == 0)
+        rooms = self.course_room_count[course]
+        new_rooms = rooms + (self.course_rooms[course * len(state.room_ids) + room] == 0)
+
+        penalty += max(0, min_days - new_days) * MIN_WORKING_DAYS_PENALTY + new_rooms - 1
+        if self.course_assigned[course] > 0:
+            penalty -= max(0, min_days - days) * MIN_WORKING_DAYS_PENALTY + rooms - 1
+        return penalty
+
+
+    def assign_delta(self, event_id, room, weekday, timeslot):
+        return self._hard_delta(event_id, room, weekday, timeslot), self._soft_delta(event_id, room, weekday, timeslot)
+
+
+    def assign(self, event_id, room, weekday, timeslot):
+        hard_delta, soft_delta = self.assign_delta(event_id, room, weekday, timeslot)
+        self._update(event_id, room, weekday, timeslot, 1)
+        self.hard_penalty += hard_delta
+        self.soft_penalty += soft_delta
+        return hard_delta, soft_delta
+
+
+    def unassign(self, event_id, room, weekday, timeslot):
+        self._update(event_id, room, weekday, timeslot, -1)
+        hard_delta, soft_delta = self.assign_delta(event_id, room, weekday, timeslot)
+        self.hard_penalty -= hard_delta
+        self.soft_penalty -= soft_delta
+        return -hard_delta, -soft_delta
+
+
+    def cross_check(self, conflicts_checker, unassigned_events = ()):
+        expected = evaluate_timetable(conflicts_checker, self.state, unassigned_events)
+        assert self.penalties(unassigned_events) == expected, f"Incremental evaluation {self.penalties(unassigned_events)} differs from full evaluation {expected}"
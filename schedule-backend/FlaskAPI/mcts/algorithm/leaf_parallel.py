@@ -0,0 +1,47 @@
+from algorithm.tree_parallel import TreeParallelMCTS
+from algorithm.macros import DIVING, DEBUG_PROGRESS
+import time
+
+class LeafParallelMCTS(TreeParallelMCTS):
+
+    # Sequential selection and expansion, then one rollout per worker from the new leaf. Every rollout is processed
+    # like a sequential simulation, so the leaf's best penalties take the best of the batch, and the leaf is
+    # backpropagated once with the normalized result of that best.
+    def run(self):
+        mcts = self.mcts
+        params = mcts.params
+
+        executor = self.start()
+        try:
+            with mcts.timer.phase("search"):
+                start_time = time.time()
+                duration = time.time() - start_time
+                i = 0
+                while (params.iterations is None or i < params.iterations) and (duration <= params.time_limit):
+                    if not mcts.selection():
+                        print("Full tree!\n")
+                        break
+                    if mcts.expansion():
+                        leaf = mcts.current_node
+                        is_fully_expanded = mcts.is_current_node_fully_expanded if DIVING else False
+                        futures = [self.submit_rollout(executor, leaf) for _ in range(self.workers)]
+
+                        for future in futures:
+                            simulation_hard, simulation_soft = self.process_rollout(leaf, is_fully_expanded, future.result(), start_time)
+                            if self.optimal_found(): break
+                        if self.optimal_found():
+                            print("Optimal solution found!\n")
+                            break
+
+                        leaf.backpropagate(simulation_hard, simulation_soft)
+                        duration = time.time() - start_time
+                        if DEBUG_PROGRESS: mcts.update_progress_metrics(i+1)
+                    i += 1
+        except KeyboardInterrupt:
+            print("Execution interrupted by user.\n")
+
+        return self.finish(executor)
+
+
+def run_leaf_parallel(current_timetable, config, workers, seed = None, timer = None):
+    return LeafParallelMCTS(current_timetable, config, workers, seed, timer).run()
@@ -0,0 +1,184 @@
+import math, random, time
+from abc import ABC, abstractmethod
+from array import array
+from algorithm.hill_climbing import HillClimbing, Move
+from algorithm.macros import LS_IDLE, SA_INITIAL_TEMPERATURE, SA_MIN_TEMPERATURE, SA_COOLING_RATE, SA_STEPS_PER_TEMPERATURE, LAHC_LENGTH, TABU_TENURE, TABU_CANDIDATES
+
+class LocalSearch(HillClimbing, ABC):
+
+    # Engines that may accept worse moves, on the neighbourhoods of HillClimbing. Only feasible moves are considered;
+    # the best timetable met is kept as a copy of the assignment columns and restored when the engine stops, so the
+    # caller finds the state at the returned penalty, as with hill climbing.
+    name = "local_search"
+
+    def __init__(self, conflicts_checker, events, days, writer, idle = LS_IDLE):
+        super().__init__(conflicts_checker, events, days, writer)
+        self.idle = idle
+        self.iteration = 0
+
+
+    def start(self, state, current): # called once per run, before the first move
+        pass
+
+
+    def next_move(self, state, unscheduled_events):
+        return self.random_move(state, unscheduled_events)
+
+
+    @abstractmethod
+    def accept(self, candidate, current): # whether the run moves to a feasible candidate, given the current soft result
+        pass
+
+
+    def save_best(self, state):
+        self.best = (array('h', state.room), array('h', state.weekday), array('h', state.timeslot))
+
+
+    def restore_best(self, state):
+        rooms, weekdays, timeslots = self.best
+        for event in self.unscheduled:
+            if (state.room[event], state.weekday[event], state.timeslot[event]) != (rooms[event], weekdays[event], timeslots[event]):
+                state.move(event, rooms[event], weekdays[event], timeslots[event])
+
+
+    def run_hill_climbing(self, state, unscheduled_events, best_result_soft, start_time, time_limit):
+        self.best_result_soft = best_result_soft
+        self.unscheduled = set(unscheduled_events)
+        self.iteration = 0
+        current = -state.evaluator.soft_penalty
+        self.save_best(state)
+        self.start(state, current)
+
+        idle_iterations = 0
+
+        while idle_iterations < self.idle and (time.time() - start_time <= time_limit):
+            self.iteration += 1
+            move = self.next_move(state, unscheduled_events)
+
+            if move is None:
+                idle_iterations += 1
+                continue
+
+            result = -state.evaluator.soft_penalty
+
+            if move.hard_delta == 0 and self.accept(result, current):
+                self.selector.reward(self.neighborhood, max(result - current, 0))
+                current = result
+                if result > self.best_result_soft:
+                    self.best_result_soft = result
+                    self.save_best(state)
+                    self.writer.submit(state, start_time, 0, result, self.name)
+                    if result == 0: break
+                    idle_iterations = 0
+                    continue
+            else:
+                move.revert()
+            idle_iterations += 1
+
+        self.restore_best(state)
+        return self.best_result_soft
+
+
+class SimulatedAnnealing(LocalSearch):
+
+    # Geometric cooling by steps; a worse move is accepted with probability exp(-delta / temperature). Once the
+    # temperature falls below the minimum it is raised back to the initial one, the idle limit ends the run.
+    name = "simulated_annealing"
+
+    def __init__(self, conflicts_checker, events, days, writer, idle = LS_IDLE, initial_temperature = SA_INITIAL_TEMPERATURE,
+                 min_temperature = SA_MIN_TEMPERATURE, cooling_rate = SA_COOLING_RATE, steps_per_temperature = SA_STEPS_PER_TEMPERATURE):
+        super().__init__(conflicts_checker, events, days, writer, idle)
+        self.initial_temperature = initial_temperature
+        self.min_temperature = min_temperature
+        self.cooling_rate = cooling_rate
+        self.steps_per_temperature = steps_per_temperature
+        self.temperature = initial_temperature
+
+
+    def start(self, state, current):
+        self.temperature = self.initial_temperature
+
+
+    def next_move(self, state, unscheduled_events):
+        if self.iteration % self.steps_per_temperature == 0:
+            self.temperature *= self.cooling_rate
+            if self.temperature < self.min_temperature: self.temperature = self.initial_temperature
+        return self.random_move(state, unscheduled_events)
+
+
+    def accept(self, candidate, current):
+        return candidate >= current or random.random() < math.exp((candidate - current) / self.temperature)
+
+
+class LateAcceptance(LocalSearch):
+
+    # Late acceptance hill climbing: a move is accepted if it is no worse than the current timetable or than the
+    # one of `length` iterations ago
+    name = "late_acceptance"
+
+    def __init__(self, conflicts_checker, events, days, writer, idle = LS_IDLE, length = LAHC_LENGTH):
+        super().__init__(conflicts_checker, events, days, writer, idle)
+        self.length = length
+        self.history = []
+
+
+    def start(self, state, current):
+        self.history = [current] * self.length
+
+
+    def accept(self, candidate, current):
+        slot = self.iteration % self.length
+        accepted = candidate >= current or candidate >= self.history[slot]
+        self.history[slot] = candidate if accepted else current
+        return accepted
+
+
+class TabuSearch(LocalSearch):
+
+    # Samples `candidates` moves per iteration and takes the best allowed one, worse or not. The events it moves become
+    # tabu for `tenure` iterations; a tabu move is still allowed if it gives a new best (aspiration).
+    name = "tabu"
+
+    def __init__(self, conflicts_checker, events, days, writer, idle = LS_IDLE, tenure = TABU_TENURE, candidates = TABU_CANDIDATES):
+        super().__init__(conflicts_checker, events, days, writer, idle)
+        self.tenure = tenure
+        self.candidates = candidates
+        self.tabu_until = {}
+
+
+    def start(self, state, current):
+        self.tabu_until = {}
+
+
+    def next_move(self, state, unscheduled_events):
+        best_targets, best_result, best_neighborhood = None, float('-inf'), None
+        for _ in range(self.candidates):
+            move = self.random_move(state, unscheduled_events)
+            if move is None: continue
+            result = -state.evaluator.soft_penalty
+            moved_events = list(dict.fromkeys(event for event, _, _, _ in move.undo_log))
+            allowed = result > self.best_result_soft or all(self.tabu_until.get(event, 0) < self.iteration for event in moved_events)
+            if move.hard_delta == 0 and allowed and result > best_result:
+                best_targets, best_result, best_neighborhood = [(event, state.room[event], state.weekday[event], state.timeslot[event]) for event in moved_events], result, self.neighborhood
+            move.revert()
+
+        if best_targets is None: return None
+
+        self.neighborhood = best_neighborhood # the one credited if the move is accepted
+        move = Move(state)
+        for event, room, weekday, timeslot in best_targets:
+            move.apply(event, room, weekday, timeslot)
+            self.tabu_until[event] = self.iteration + self.tenure
+        return move
+
+
+    def accept(self, candidate, current):
+        return True
+
+
+LOCAL_SEARCH_ENGINES = {
+    "hill_climbing": HillClimbing,
+    "simulated_annealing": SimulatedAnnealing,
+    "late_acceptance": LateAcceptance,
+    "tabu": TabuSearch
+}
@@ -0,0 +1,114 @@
+from algorithm.mcts import MCTS
+from algorithm.local_search import LOCAL_SEARCH_ENGINES
+from algorithm.macros import PORTFOLIO_ENGINES, PORTFOLIO_TIME
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+import queue
+import random
+import signal
+import time
+
+_worker_mcts = None
+_worker_queue = None
+_worker_engines = {}
+
+class ImprovementQueue:
+
+    # Stands in for the SolutionWriter of the engines run by the workers: every new best goes back to the
+    # coordinator as a full path, to start other searches from, and as the timetable to write out
+    def __init__(self, improvements):
+        self.improvements = improvements
+
+
+    def submit(self, state, start_time, hard_penalty_result, soft_penalty_result, phase = "mcts", iteration = None):
+        path = [(event_id, state.weekday[event_id], state.timeslot[event_id], state.room[event_id]) for event_id in range(len(state.room))]
+        self.improvements.put((soft_penalty_result, phase, path, state.timetable()))
+
+
+def init_manager(): # Ctrl+C stops the search, the queue must still hand over the improvements found so far
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def init_worker(current_timetable, config, improvements):
+    global _worker_mcts, _worker_queue
+    _worker_mcts = MCTS(current_timetable, config)
+    _worker_queue = improvements
+
+
+def local_search_worker(path, soft_penalty, engine_name, seed, time_limit):
+    mcts = _worker_mcts
+    if engine_name not in _worker_engines:
+        _worker_engines[engine_name] = LOCAL_SEARCH_ENGINES[engine_name](mcts.conflicts_checker, mcts.events, mcts.config.days, ImprovementQueue(_worker_queue))
+    random.seed(seed)
+
+    mcts.restore_path(path)
+    movable_events = [event_id for event_id, _, _, _ in path] # the incumbent is complete and no longer tied to the tree
+    return _worker_engines[engine_name].run_hill_climbing(mcts.state, movable_events, soft_penalty, time.time(), time_limit)
+
+
+class LocalSearchPortfolio:
+
+    # Local searches in worker processes on the best feasible timetable while the tree search goes on. Every free
+    # worker gets the incumbent with the next engine of `engines` and its own seed, for at most `budget` seconds
+    # and never past the deadline. The new bests found by the workers are queued back as they happen; poll()
+    # returns them and submit() makes the best one the next incumbent. The queue lives in a manager process, so a
+    # worker's put is complete when its search returns and close() never waits on a full pipe.
+    def __init__(self, current_timetable, config, workers, seed = None, engines = PORTFOLIO_ENGINES, budget = PORTFOLIO_TIME):
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.engines = engines
+        self.budget = budget
+        self.manager = SyncManager()
+        self.manager.start(init_manager)
+        self.improvements = self.manager.Queue()
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(current_timetable, config, self.improvements))
+        self.running = set()
+        self.incumbent = None
+        self.deadline = None
+        self.jobs = 0
+        self.closed = False
+
+
+    def submit(self, path, soft_penalty, deadline):
+        if self.closed: return
+        self.incumbent = (path, soft_penalty)
+        self.deadline = deadline
+        self.dispatch()
+
+
+    def dispatch(self):
+        if self.closed or self.incumbent is None: return
+        while len(self.running) < self.workers:
+            time_limit = min(self.budget, self.deadline - time.time())
+            if time_limit <= 0: return
+            engine_name = self.engines[self.jobs % len(self.engines)]
+            self.running.add(self.executor.submit(local_search_worker, *self.incumbent, engine_name, self.seed + self.jobs, time_limit))
+            self.jobs += 1
+
+
+    def poll(self): # new bests reported since the last call, as (soft penalty, engine, path, timetable)
+        improvements = []
+        while True:
+            try:
+                improvements.append(self.improvements.get_nowait())
+            except queue.Empty:
+                break
+
+        done = {future for future in self.running if future.done()}
+        for future in done:
+            if future.exception() is not None: print(f"Error: a local search worker failed: {future.exception()}")
+        self.running -= done
+        self.dispatch()
+        return improvements
+
+
+    def close(self): # waits for the running searches, bounded by their time limit, and returns their last improvements
+        self.closed = True
+        try:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        except KeyboardInterrupt:
+            print("Execution interrupted by user.\n")
+        self.running.clear()
+        improvements = self.poll()
+        self.manager.shutdown()
+        return improvements
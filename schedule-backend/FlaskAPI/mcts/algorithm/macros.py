@@ -8,10 +8,34 @@ MIN_WORKING_DAYS_PENALTY = 5
 CURRICULUM_COMPACTNESS_PENALTY = 2
 
 HC_IDLE = 5000
+LOCAL_SEARCH = "hill_climbing" # engine run on each new feasible best: hill_climbing, simulated_annealing, late_acceptance or tabu
+LS_IDLE = 50000 # iterations without a new best before the simulated annealing, late acceptance and tabu engines stop
+SA_INITIAL_TEMPERATURE = 2.0 # soft penalty points, the schedule starts over from here when it reaches SA_MIN_TEMPERATURE
+SA_MIN_TEMPERATURE = 0.05
+SA_COOLING_RATE = 0.998 # geometric cooling: temperature multiplied by this every SA_STEPS_PER_TEMPERATURE iterations
+SA_STEPS_PER_TEMPERATURE = 20
+LAHC_LENGTH = 1000 # penalties remembered by late acceptance hill climbing
+TABU_TENURE = 5 # iterations during which a moved event may not be moved again, unless it gives a new best
+TABU_CANDIDATES = 20 # moves sampled per tabu iteration, the best allowed one is taken even if it is worse
+ADAPTIVE_NEIGHBORHOODS = False # learn the neighbourhood weights from the soft penalty improvement per CPU second of each one (runs then depend on timing)
+ADAPTIVE_PERIOD = 500 # moves between two updates of the neighbourhood weights
+ADAPTIVE_REACTION = 0.3 # share of each update given to the last period, the rest stays with the previous weights
+ADAPTIVE_MIN_SHARE = 0.05 # lowest probability of a neighbourhood, so none is dropped for good
+PORTFOLIO_ENGINES = ("simulated_annealing", "tabu", "hill_climbing") # engines given in turn to the --local_search_workers
+PORTFOLIO_TIME = 10 # seconds of each background local search, the worker then starts again from the best timetable
+ROOT_SYNC_INTERVAL = 5 # seconds between root statistics merges in root-parallel runs
+VIRTUAL_LOSS = 3 # visits added along the path of each in-flight simulation in tree-parallel runs
+WRITE_INTERVAL = 1 # minimum seconds between two writes of the best timetable to the output file
+PROGRESS_CAPACITY = 4096 # samples kept per progress metric, thinned out evenly as the run goes on
+TREE_EXPORT_MAX_DEPTH = None # deepest level written by the tree export, None for the whole tree
+TREE_EXPORT_MIN_VISITS = 0 # nodes with fewer visits are left out of the tree export, with their subtrees
+CHECKPOINT_INTERVAL = 60 # seconds between checkpoints of sequential runs, None to disable them
 
 PRUNING = True
 HILL_CLIMBING = True
 DIVING = True
+ARRAY_TREE = False
+VECTORIZED_UCT = False
 DEBUG_RANDOM_SIMULATION = False
 
 MAX_RETRIES = 3
@@ -21,4 +45,6 @@ DEBUG_TREE = True
 DEBUG_PROGRESS = True
 DEBUG_LOG = True
 DEBUG_PROFILER = True
+DEBUG_EVALUATOR = False
+DEBUG_TIMINGS = True # per-phase wall times, cheap enough to leave on
 #DEBUG_PRINT = False
\ No newline at end of file
@@ -1,10 +1,17 @@
 from algorithm.mcts_node import *
+from algorithm.array_tree import ArrayTree
 from algorithm.utils import *
 from algorithm.debug import *
 from algorithm.check_conflicts import ConflictsChecker
-from algorithm.hill_climbing import HillClimbing
-from algorithm.simulation_results_writer import write_simulation_results
-from algorithm.macros import DEFAULT_TIME_LIMIT, DEBUG_TREE, DEBUG_PROGRESS, DEBUG_PROFILER, PRUNING, DIVING, DEBUG_RANDOM_SIMULATION, HILL_CLIMBING
+from algorithm.local_search import LOCAL_SEARCH_ENGINES
+from algorithm.incremental_evaluator import IncrementalEvaluator
+from algorithm.occupancy_index import OccupancyIndex
+from algorithm.phase_timer import PhaseTimer
+from algorithm.progress_metrics import ProgressMetrics
+from algorithm.checkpoint import checkpoint_filename, save_checkpoint, load_checkpoint
+from algorithm.timetable_state import TimetableState
+from algorithm.simulation_results_writer import SolutionWriter
+from algorithm.macros import DEFAULT_TIME_LIMIT, DEBUG_TREE, DEBUG_PROGRESS, DEBUG_PROFILER, PRUNING, DIVING, ARRAY_TREE, DEBUG_RANDOM_SIMULATION, HILL_CLIMBING, DEBUG_EVALUATOR, ROOT_SYNC_INTERVAL, CHECKPOINT_INTERVAL, LOCAL_SEARCH
 from dataclasses import dataclass
 import cProfile
 import time
@@ -22,25 +29,45 @@ class MCTSConfig:
     days: int
     periods_per_day: int
     output_filename: str = "output/output.txt"
+    local_search: str = LOCAL_SEARCH
 
 
 class MCTS:
 
-    def __init__(self, current_timetable, config: MCTSConfig):
+    def __init__(self, current_timetable, config: MCTSConfig, timer = None):
         self.config = config
         self.params = config.params
         self.rooms = current_timetable["rooms"]
-        self.events, name_to_event_ids = add_event_ids_and_priority(current_timetable["events"], config.days, config.periods_per_day, current_timetable["blocks"], current_timetable["constraints"])
-        self.root = MCTSNode(expansion_limit=root_expansion_limit(self.events[0], self.rooms))
-        self.current_node = self.root
-        
-        self.conflicts_checker = ConflictsChecker(current_timetable["constraints"], current_timetable["blocks"], self.rooms, name_to_event_ids)
-        self.hill_climber = HillClimbing(self.conflicts_checker, current_timetable["blocks"], self.rooms, config.days, name_to_event_ids, config.output_filename)
-        
+        self.timer = timer if timer is not None else PhaseTimer()
+        self.writer = SolutionWriter(config.output_filename)
+
+        with self.timer.phase("preprocess"):
+            with self.timer.phase("events"):
+                self.events = add_event_ids_and_priority(current_timetable["events"], config.days, config.periods_per_day, current_timetable["blocks"], current_timetable["constraints"])
+
+            with self.timer.phase("state"):
+                self.state = TimetableState(self.events, self.rooms, current_timetable["blocks"], config.days, config.periods_per_day)
+                self.state.evaluator = IncrementalEvaluator(self.state)
+                self.state.occupancy = OccupancyIndex(self.state)
+
+            with self.timer.phase("root"):
+                expansion_limit = root_expansion_limit(self.events[0], self.state.occupancy)
+                self.root = ArrayTree(expansion_limit).root if ARRAY_TREE else MCTSNode(expansion_limit=expansion_limit)
+                self.current_node = self.root
+
+            with self.timer.phase("conflicts_checker"):
+                self.conflicts_checker = ConflictsChecker(self.state)
+            with self.timer.phase("hill_climber"):
+                self.hill_climber = LOCAL_SEARCH_ENGINES[config.local_search](self.conflicts_checker, self.events, config.days, self.writer)
+
         self._initialize_penalties()
 
         self.previous_unassigned_events = set()
         self.output_filename = config.output_filename
+        self.simulations = 0
+        self.portfolio = None # background local searches on the best timetable, see LocalSearchPortfolio
+        self.iteration = 0 # iterations and search time already spent, when resuming from a checkpoint
+        self.elapsed = 0
 
         if DIVING:
             self.simulation_path = []
@@ -48,7 +75,8 @@ class MCTS:
             self.is_current_node_fully_expanded = False
 
         if DEBUG_PROGRESS:
-            self.metrics = {'iterations': [], 'best_hard': [], 'best_soft': [], 'current_hard': [], 'current_soft': []}
+            self.metrics = ProgressMetrics()
+            self.current_penalties = (float('-inf'), float('-inf'))
     
 
     def _initialize_penalties(self):
@@ -68,9 +96,21 @@ class MCTS:
     
 
     def update_progress_metrics(self, iteration):
-        self.metrics['iterations'].append(iteration)
-        self.metrics['best_hard'].append(self.global_best_hard_penalty)
-        self.metrics['best_soft'].append(self.global_best_soft_penalty)
+        self.metrics.record(iteration, self.global_best_hard_penalty, self.global_best_soft_penalty, *self.current_penalties)
+
+
+    def node_path(self, node): # nodes only keep their own assignment, the path is collected from the node up to the root
+        path = []
+        while node.assignment is not None:
+            path.append(node.assignment)
+            node = node.parent
+        return path
+
+
+    def restore_path(self, path):
+        self.state.clear()
+        for event_id, weekday, timeslot, room in path:
+            self.state.assign(event_id, room, weekday, timeslot)
 
 
     # MCTS steps:
@@ -100,16 +140,16 @@ class MCTS:
         while not current_node.is_terminal_node(len(self.events)):  
             if not current_node.is_fully_expanded(): break
 
-            unflagged_children = [child for child in current_node.children if child and child.expansion_limit != 0]
+            best_child = current_node.select_child(self.params.c_param)
 
-            if not unflagged_children:
+            if best_child is None:
                 """ if current_node.parent:
                     current_node.expansion_limit = 0
                     current_node = current_node.parent
                 else: """
                 return False
             else:
-                current_node = current_node.best_child(unflagged_children, self.params.c_param)
+                current_node = best_child
 
         self.current_node = current_node
         return True
@@ -117,49 +157,49 @@ class MCTS:
 
     def expansion(self):
 
-        def calculate_expansion_limit(new_path):
-            next_event = self.events[self.current_node.depth()+1] if self.current_node.depth()+1 < len(self.events) else None
+        def calculate_expansion_limit():
+            next_event = self.events[self.current_node.depth+1] if self.current_node.depth+1 < len(self.events) else None
             if next_event is None:
                 return 0
-            elif PRUNING and evaluate_timetable(self.conflicts_checker, new_path, full_evaluation=False) < self.global_best_hard_penalty:
+            elif PRUNING and -self.state.evaluator.hard_penalty < self.global_best_hard_penalty:
                 self.previous_unassigned_events.add(event["Id"])
-                self.current_node.children.append(None)
+                self.current_node.add_pruned_child()
                 return None
-            rooms_available = find_available_rooms(next_event["Capacity"], self.rooms, new_path.values(), next_event["Available_Periods"])
+            rooms_available = self.state.occupancy.available_rooms(next_event["Capacity"], next_event["Available_Periods"])
             return sum(len(rooms) for rooms in rooms_available.values())
 
         if DIVING: self.is_current_node_fully_expanded = not self.current_node.is_fully_expanded()
 
-        event = self.events[self.current_node.depth()]
+        event = self.events[self.current_node.depth]
 
         available_periods = event["Available_Periods"]
         if len(available_periods) == 0:
             self.current_node.expansion_limit = 0
             return False
 
-        rooms_by_period = find_available_rooms(event["Capacity"], self.rooms, self.current_node.path.values(), available_periods)
+        # the working state follows the child's path, which the simulation then extends
+        self.restore_path(self.node_path(self.current_node))
+
+        rooms_by_period = self.state.occupancy.available_rooms(event["Capacity"], available_periods)
 
         period_room_combinations = [(weekday, timeslot, room) for (weekday, timeslot), rooms in rooms_by_period.items() if rooms for room in rooms]
 
-        if not period_room_combinations or len(self.current_node.children) >= len(period_room_combinations):
+        if not period_room_combinations or self.current_node.expanded() >= len(period_room_combinations):
             self.current_node.expansion_limit = 0
             return False
 
-        new_weekday, new_timeslot, new_room = period_room_combinations[len(self.current_node.children)]
+        new_weekday, new_timeslot, new_room = period_room_combinations[self.current_node.expanded()]
         
-        new_path = self.current_node.path.copy()
-        new_path[event["Id"]] = {**event, "RoomId": new_room, "WeekDay": new_weekday, "Timeslot": new_timeslot}
+        self.state.assign(event["Id"], new_room, new_weekday, new_timeslot)
 
-        new_expansion_limit = calculate_expansion_limit(new_path)
+        new_expansion_limit = calculate_expansion_limit()
         if new_expansion_limit is None: return False
         
-        child_node = MCTSNode(expansion_limit=new_expansion_limit, assignment=(event["Id"], new_weekday, new_timeslot, new_room), parent=self.current_node, path=new_path)
-        self.current_node.children.append(child_node)
-        self.current_node = child_node
+        self.current_node = self.current_node.add_child(new_expansion_limit, (event["Id"], new_weekday, new_timeslot, new_room))
         return True
 
 
-    def simulation(self, start_time, time_limit):
+    def rollout(self, depth): # completes the working state greedily, from the event at the given depth onwards
 
         def find_best_room_and_period():
             if not event["Available_Periods"]: return None
@@ -167,80 +207,94 @@ class MCTS:
             min_soft_penalty = float('inf')
             candidates = []
 
-            compactness_weight = min(1, (i+self.current_node.depth()) / (len(self.events)-1))
-
-            for weekday, timeslot in event["Available_Periods"]:
-                available_rooms = find_available_rooms(event["Capacity"], self.rooms, assigned_events.values(), [(weekday,timeslot)])
-                if available_rooms.values() != [set()]:
-                    for room in list(list(available_rooms.values())[0]):
-                        hard_penalty = self.conflicts_checker.check_event_hard_constraints(event, assigned_events, room, timeslot, weekday)
-                        if hard_penalty == 0:
-                            soft_penalty = (
-                                self.conflicts_checker.check_room_capacity(event, room)
-                                + compactness_weight * self.conflicts_checker.check_block_compactness(event, assigned_events, timeslot, weekday)
-                                + self.conflicts_checker.check_min_working_days(event, assigned_events, weekday)
-                                + self.conflicts_checker.check_room_stability(event, assigned_events, room)
-                            )
-                            if soft_penalty < min_soft_penalty:
-                                min_soft_penalty = soft_penalty
-                                candidates = [(room, weekday, timeslot)]
-                            elif soft_penalty == min_soft_penalty:
-                                candidates.append((room, weekday, timeslot))
+            compactness_weight = min(1, (i+depth) / (len(self.events)-1))
+
+            available_rooms = self.state.occupancy.available_rooms(event["Capacity"], event["Available_Periods"])
+            for (weekday, timeslot), rooms in available_rooms.items():
+                for room in rooms:
+                    hard_penalty = self.conflicts_checker.check_event_hard_constraints(event["Id"], self.state, room, timeslot, weekday)
+                    if hard_penalty == 0:
+                        soft_penalty = (
+                            self.conflicts_checker.check_room_capacity(event["Id"], room)
+                            + compactness_weight * self.conflicts_checker.check_block_compactness(event["Id"], self.state, timeslot, weekday)
+                            + self.conflicts_checker.check_min_working_days(event["Id"], self.state, weekday)
+                            + self.conflicts_checker.check_room_stability(event["Id"], self.state, room)
+                        )
+                        if soft_penalty < min_soft_penalty:
+                            min_soft_penalty = soft_penalty
+                            candidates = [(room, weekday, timeslot)]
+                        elif soft_penalty == min_soft_penalty:
+                            candidates.append((room, weekday, timeslot))
             if candidates:
                 return random.choice(candidates)
             else: return None
-            
-
-        def update_penalties(soft_penalty, hard_penalty = None):
-            if hard_penalty is not None:
-                self.worst_hard_penalty = min(hard_penalty, self.worst_hard_penalty)
-                self.current_node.best_hard_penalty = max(hard_penalty, self.current_node.best_hard_penalty)
-            self.best_soft_penalty = max(soft_penalty, self.best_soft_penalty)
-            self.worst_soft_penalty = min(soft_penalty, self.worst_soft_penalty)
-            self.current_node.best_soft_penalty = max(soft_penalty, self.current_node.best_soft_penalty)
 
 
-        assigned_events = self.current_node.path.copy()
+        simulated_events = []
         unassigned_events = set()
-        remaining_events = sorted(self.events[self.current_node.depth():], key=lambda event: (event["Id"] in self.previous_unassigned_events, event["Priority"], random.random()), reverse=True)
+        remaining_events = sorted(self.events[depth:], key=lambda event: (event["Id"] in self.previous_unassigned_events, event["Priority"], random.random()), reverse=True)
 
         for i, event in enumerate(remaining_events):
             if DEBUG_RANDOM_SIMULATION:
-                event["RoomId"], event["WeekDay"], event["Timeslot"] = random.choice(list(self.rooms.keys())), random.randrange(0, self.config.days), random.randrange(0, self.config.periods_per_day)
-                assigned_events[event["Id"]] = event 
+                self.state.assign(event["Id"], random.randrange(0, len(self.state.room_ids)), random.randrange(0, self.config.days), random.randrange(0, self.config.periods_per_day))
+                simulated_events.append(event["Id"])
             else:
                 best_room_and_period = find_best_room_and_period()
                 if best_room_and_period:
-                    event["RoomId"], event["WeekDay"], event["Timeslot"] = best_room_and_period  
-                    assigned_events[event["Id"]] = event 
+                    room, weekday, timeslot = best_room_and_period
+                    self.state.assign(event["Id"], room, weekday, timeslot)
+                    simulated_events.append(event["Id"])
                 else: 
-                    self.previous_unassigned_events.add(event["Id"])
+                    self.mark_unassigned(event)
                     unassigned_events.add(event["Id"])
-                    event["Priority"] += 50
 
-        hard_penalty_result, soft_penalty_result = evaluate_timetable(self.conflicts_checker, assigned_events, unassigned_events)
+        return simulated_events, unassigned_events
+
+
+    def mark_unassigned(self, event): # events left out of a simulation are tried first in the next ones
+        self.previous_unassigned_events.add(event["Id"])
+        event["Priority"] += 50
+
+
+    def update_penalties(self, soft_penalty, hard_penalty = None):
+        if hard_penalty is not None:
+            self.worst_hard_penalty = min(hard_penalty, self.worst_hard_penalty)
+            self.current_node.best_hard_penalty = max(hard_penalty, self.current_node.best_hard_penalty)
+        self.best_soft_penalty = max(soft_penalty, self.best_soft_penalty)
+        self.worst_soft_penalty = min(soft_penalty, self.worst_soft_penalty)
+        self.current_node.best_soft_penalty = max(soft_penalty, self.current_node.best_soft_penalty)
+
+
+    def process_simulation_results(self, simulated_events, unassigned_events, start_time, time_limit):
+        self.simulations += 1
+        hard_penalty_result, soft_penalty_result = self.state.evaluator.penalties(unassigned_events)
+        if DEBUG_EVALUATOR: self.state.evaluator.cross_check(self.conflicts_checker, unassigned_events)
         
         if DEBUG_PROGRESS:
-            self.metrics["current_hard"].append(hard_penalty_result)
-            self.metrics["current_soft"].append(soft_penalty_result)
+            self.current_penalties = (hard_penalty_result, soft_penalty_result)
 
-        update_penalties(soft_penalty_result, hard_penalty_result)
+        self.update_penalties(soft_penalty_result, hard_penalty_result)
         
         if (hard_penalty_result > self.global_best_hard_penalty) or (hard_penalty_result == self.global_best_hard_penalty and soft_penalty_result > self.global_best_soft_penalty):
             self.global_best_hard_penalty, self.global_best_soft_penalty = hard_penalty_result, soft_penalty_result
-            write_simulation_results(self.output_filename, list(assigned_events.values()), start_time, hard_penalty_result, soft_penalty_result)
+            with self.timer.phase("write_out"):
+                self.writer.submit(self.state, start_time, hard_penalty_result, soft_penalty_result, "mcts", self.simulations)
             
             if len(unassigned_events) == 0 and hard_penalty_result == 0 and soft_penalty_result != 0:
-                if HILL_CLIMBING:
-                    self.global_best_soft_penalty, assigned_events = self.hill_climber.run_hill_climbing(assigned_events, self.events[self.current_node.depth()]["Id"], self.global_best_soft_penalty, start_time, time_limit)
-                    update_penalties(self.global_best_soft_penalty)
+                if self.portfolio is not None:
+                    path = [(event_id, self.state.weekday[event_id], self.state.timeslot[event_id], self.state.room[event_id]) for event_id in self.state.assigned_events()]
+                    self.portfolio.submit(path, soft_penalty_result, start_time + time_limit)
+                elif HILL_CLIMBING:
+                    with self.timer.phase("hill_climbing"):
+                        self.global_best_soft_penalty = self.hill_climber.run_hill_climbing(self.state, simulated_events, self.global_best_soft_penalty, start_time, time_limit)
+                    self.update_penalties(self.global_best_soft_penalty)
                 
                 if DIVING:
                     if not self.simulation_path or self.is_current_node_fully_expanded:
                         new_path = [
-                            (event_id, event["WeekDay"], event["Timeslot"], event["RoomId"])
-                            for event_id, event in assigned_events.items()
-                            if event_id not in self.current_node.path and event_id != self.events[-1]["Id"]
+                            (event_id, self.state.weekday[event_id], self.state.timeslot[event_id], self.state.room[event_id])
+                            for event_id in simulated_events
+                            if event_id != self.events[-1]["Id"]
                         ]
                         if new_path:                          
                             if not self.simulation_path:
@@ -258,51 +312,112 @@ class MCTS:
         #print(f"{hard_penalty_result} {soft_penalty_result} {simulation_result_hard} {simulation_result_soft}")
 
         return simulation_result_hard, simulation_result_soft
+
+
+    def simulation(self, start_time, time_limit):
+        simulated_events, unassigned_events = self.rollout(self.current_node.depth)
+        return self.process_simulation_results(simulated_events, unassigned_events, start_time, time_limit)
     
 
     def backpropagation(self, simulation_result_hard, simulation_result_soft):
-        node = self.current_node
-        while node is not None:
-            node.visits += 1
-            node.score_hard += simulation_result_hard
-            node.score_soft += simulation_result_soft
-            node = node.parent
+        self.current_node.backpropagate(simulation_result_hard, simulation_result_soft)
+
 
+    def resume(self):
+        load_checkpoint(self, checkpoint_filename(self.output_filename))
+
+
+    def checkpoint(self, iteration, elapsed):
+        with self.timer.phase("checkpoint"):
+            save_checkpoint(self, checkpoint_filename(self.output_filename), iteration, elapsed)
+
+
+    def collect_improvements(self, improvements, start_time):
+        for soft_penalty, phase, path, timetable in improvements:
+            if self.global_best_hard_penalty != 0 or soft_penalty <= self.global_best_soft_penalty: continue
+            self.global_best_soft_penalty = soft_penalty
+            self.best_soft_penalty = max(soft_penalty, self.best_soft_penalty)
+            with self.timer.phase("write_out"):
+                self.writer.submit_timetable(timetable, start_time, 0, soft_penalty, phase)
+            if self.portfolio is not None: self.portfolio.submit(path, soft_penalty, start_time + self.params.time_limit)
 
-    def run_mcts(self):
+
+    def run_mcts(self, root_sync = None, portfolio = None):
         if DEBUG_PROFILER:
             profiler = cProfile.Profile()
             profiler.enable()
 
+        checkpointing = CHECKPOINT_INTERVAL is not None and root_sync is None # root-parallel workers are not resumable
+        self.portfolio = portfolio
         try:
-            start_time = time.time()
-            duration = time.time() - start_time
-            i = 0
-            while (self.params.iterations is None or i < self.params.iterations) and (duration <= self.params.time_limit):
-                if not self.selection():
-                    print("Full tree!\n")
-                    break
-                if self.expansion():
-                    simulation_hard, simulation_soft = self.simulation(start_time, self.params.time_limit)
-                    if self.global_best_hard_penalty == 0 and self.global_best_soft_penalty == 0:
-                        print("Optimal solution found!\n")
+            with self.timer.phase("search"):
+                start_time = time.time() - self.elapsed
+                duration = time.time() - start_time
+                last_sync = last_checkpoint = time.time()
+                i = self.iteration
+                while (self.params.iterations is None or i < self.params.iterations) and (duration <= self.params.time_limit):
+                    if not self.selection():
+                        print("Full tree!\n")
                         break
-                    self.backpropagation(simulation_hard, simulation_soft)
-                    duration = time.time() - start_time
-                    if DEBUG_PROGRESS: self.update_progress_metrics(i+1)
-                i += 1
+                    if self.expansion():
+                        simulation_hard, simulation_soft = self.simulation(start_time, self.params.time_limit)
+                        if self.global_best_hard_penalty == 0 and self.global_best_soft_penalty == 0:
+                            print("Optimal solution found!\n")
+                            break
+                        self.backpropagation(simulation_hard, simulation_soft)
+                        if portfolio is not None:
+                            self.collect_improvements(portfolio.poll(), start_time)
+                            if self.global_best_hard_penalty == 0 and self.global_best_soft_penalty == 0:
+                                print("Optimal solution found by a local search!\n")
+                                break
+                        duration = time.time() - start_time
+                        if DEBUG_PROGRESS: self.update_progress_metrics(i+1)
+                        if root_sync is not None and time.time() - last_sync >= ROOT_SYNC_INTERVAL:
+                            last_sync = time.time()
+                            if root_sync(self):
+                                print("Optimal solution found by another worker!\n")
+                                break
+                        if checkpointing and time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                            self.checkpoint(i+1, time.time() - start_time)
+                            last_checkpoint = time.time()
+                    i += 1
         except KeyboardInterrupt:
             print("Execution interrupted by user.\n")
             duration = time.time() - start_time
 
-        if DEBUG_TREE or DEBUG_PROGRESS or DEBUG_PROFILER:
-            try:
-                _, tail = os.path.split(self.output_filename)
-                input_file_name = tail.split('_')[0]
+        if portfolio is not None:
+            self.portfolio = None # the last improvements are not handed out again
+            with self.timer.phase("local_search_portfolio"):
+                self.collect_improvements(portfolio.close(), start_time)
+        if checkpointing: self.checkpoint(i, time.time() - start_time)
+
+        self.close_writer()
+        self.count_neighborhoods()
+        self.save_debug_outputs(profiler if DEBUG_PROFILER else None)
+
 
-                if DEBUG_PROFILER: profile_execution(profiler, f"{input_file_name}_profiler_outuput.txt")
-                if DEBUG_PROGRESS: plot_progress(self.metrics, f"{input_file_name}_constraint_progress.html")
-                if DEBUG_TREE: visualize_tree(self.root, f"{input_file_name}_tree")
+    def close_writer(self): # the last best timetable may still be waiting for its write
+        with self.timer.phase("write_out"):
+            self.writer.close()
+
+
+    def count_neighborhoods(self): # moves tried, accepted, improvement and seconds per hill climbing neighbourhood
+        for name, values in self.hill_climber.selector.counters().items():
+            self.timer.count(f"neighborhoods/{name}", values)
+
+
+    def save_debug_outputs(self, profiler = None):
+        if DEBUG_TREE or DEBUG_PROGRESS or profiler is not None:
+            try:
+                with self.timer.phase("debug_outputs"):
+                    _, tail = os.path.split(self.output_filename)
+                    input_file_name = tail.split('_')[0]
+
+                    if profiler is not None: profile_execution(profiler, f"{input_file_name}_profiler_outuput.txt")
+                    if DEBUG_PROGRESS:
+                        save_progress(self.metrics, f"{input_file_name}_constraint_progress.csv")
+                        plot_progress(self.metrics.as_dict(), f"{input_file_name}_constraint_progress.html")
+                    if DEBUG_TREE: save_tree(self.root, f"{input_file_name}_tree.csv")
 
             except KeyboardInterrupt:
                 print("Execution interrupted by user.\n")
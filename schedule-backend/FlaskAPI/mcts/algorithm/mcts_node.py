@@ -1,11 +1,33 @@
+from algorithm.macros import VECTORIZED_UCT
 import math
 
+try:
+    import numpy as np
+except ImportError: # only needed by the vectorized UCT selection
+    np = None
+
+if VECTORIZED_UCT and np is None:
+    raise ImportError("VECTORIZED_UCT requires numpy to be installed")
+
+
+def uct_best_index(parent_visits, visits, score_hard, score_soft, c_param):
+    # Same weights as best_child in one pass over the children: the hard UCT picks the candidates and the soft UCT breaks ties
+    visits = np.asarray(visits, dtype=np.float64)
+    exploration = np.sqrt(2 * math.log(parent_visits) / visits)
+    weights_hard = np.asarray(score_hard, dtype=np.float64) / visits + 2 * c_param * exploration
+    weights_soft = np.asarray(score_soft, dtype=np.float64) / visits + c_param * exploration
+    weights_soft[weights_hard != weights_hard.max()] = -np.inf
+    return int(weights_soft.argmax())
+
+
 class MCTSNode:
 
-    def __init__(self, expansion_limit, assignment = None, path = {}, parent = None):
+    __slots__ = ("parent", "children", "depth", "visits", "score_hard", "score_soft", "best_hard_penalty", "best_soft_penalty", "expansion_limit", "assignment")
+
+    def __init__(self, expansion_limit, assignment = None, depth = 0, parent = None):
         self.parent = parent
         self.children = []
-        self.path = path
+        self.depth = depth
         self.visits = 0
         self.score_hard = 0
         self.score_soft = 0
@@ -13,19 +35,36 @@ class MCTSNode:
         self.best_soft_penalty = float("-inf")
         self.expansion_limit = expansion_limit
         self.assignment = assignment
-    
 
-    def depth(self):
-        return len(self.path)
-    
 
     def is_fully_expanded(self):
         return self.expansion_limit == 0 or len(self.children) == self.expansion_limit
 
 
     def is_terminal_node(self, num_events):
-        return self.expansion_limit == 0 or self.depth() == num_events
-    
+        return self.expansion_limit == 0 or self.depth == num_events
+
+
+    def expanded(self): # pruned expansions are kept as None children so they still count
+        return len(self.children)
+
+
+    def add_child(self, expansion_limit, assignment):
+        child = MCTSNode(expansion_limit=expansion_limit, assignment=assignment, depth=self.depth+1, parent=self)
+        self.children.append(child)
+        return child
+
+
+    def add_pruned_child(self):
+        self.children.append(None)
+
+
+    def select_child(self, c_param):
+        unflagged_children = [child for child in self.children if child and child.expansion_limit != 0]
+        if not unflagged_children: return None
+        if VECTORIZED_UCT: return self.best_child_vectorized(unflagged_children, c_param)
+        return self.best_child(unflagged_children, c_param)
+
 
     def best_child(self, unflagged_children, c_param):
         choices_weights = [
@@ -42,3 +81,29 @@ class MCTSNode:
         ]
 
         return best_children[choices_weights.index(max(choices_weights))]
+
+
+    def best_child_vectorized(self, unflagged_children, c_param):
+        return unflagged_children[uct_best_index(
+            self.visits,
+            [child.visits for child in unflagged_children],
+            [child.score_hard for child in unflagged_children],
+            [child.score_soft for child in unflagged_children],
+            c_param
+        )]
+
+
+    def backpropagate(self, result_hard, result_soft):
+        node = self
+        while node is not None:
+            node.visits += 1
+            node.score_hard += result_hard
+            node.score_soft += result_soft
+            node = node.parent
+
+
+    def add_virtual_loss(self, virtual_loss): # in-flight simulations count as visits without reward, negative to remove them
+        node = self
+        while node is not None:
+            node.visits += virtual_loss
+            node = node.parent
@@ -0,0 +1,67 @@
+import random
+from algorithm.macros import ADAPTIVE_NEIGHBORHOODS, ADAPTIVE_PERIOD, ADAPTIVE_REACTION, ADAPTIVE_MIN_SHARE
+
+COUNTERS = ("attempts", "accepted", "improvement", "seconds")
+
+class NeighborhoodSelector:
+
+    # Roulette over the neighbourhoods. With `adaptive`, every `period` attempts each weight moves by `reaction`
+    # towards the neighbourhood's share of the soft penalty improvement per CPU second over that period, and no
+    # weight falls below `min_share`. Periods without any improvement leave the weights as they are. The counters
+    # cover the whole run: attempts, accepted moves, soft penalty improvement and CPU seconds spent building the moves.
+    def __init__(self, names, weights, adaptive = ADAPTIVE_NEIGHBORHOODS, period = ADAPTIVE_PERIOD, reaction = ADAPTIVE_REACTION, min_share = ADAPTIVE_MIN_SHARE):
+        self.names = names
+        total = sum(weights)
+        self.weights = [weight / total for weight in weights]
+        self.adaptive = adaptive
+        self.period = period
+        self.reaction = reaction
+        self.min_share = min_share
+
+        self.attempts = [0] * len(names)
+        self.accepted = [0] * len(names)
+        self.improvement = [0] * len(names)
+        self.seconds = [0.0] * len(names)
+        self.period_attempts = 0
+        self.period_improvement = [0] * len(names)
+        self.period_seconds = [0.0] * len(names)
+
+
+    def choose(self):
+        return random.choices(range(len(self.names)), weights=self.weights, k=1)[0]
+
+
+    def record(self, index, seconds):
+        self.attempts[index] += 1
+        self.seconds[index] += seconds
+        if not self.adaptive: return
+        self.period_seconds[index] += seconds
+        self.period_attempts += 1
+        if self.period_attempts >= self.period: self.adapt()
+
+
+    def reward(self, index, improvement):
+        self.accepted[index] += 1
+        self.improvement[index] += improvement
+        self.period_improvement[index] += improvement
+
+
+    def adapt(self):
+        rates = [improvement / seconds if seconds > 0 else 0 for improvement, seconds in zip(self.period_improvement, self.period_seconds)]
+        total = sum(rates)
+        if total > 0:
+            weights = [(1 - self.reaction) * weight + self.reaction * rate / total for weight, rate in zip(self.weights, rates)]
+            weights = [max(weight, self.min_share) for weight in weights]
+            total = sum(weights)
+            self.weights = [weight / total for weight in weights]
+
+        self.period_attempts = 0
+        self.period_improvement = [0] * len(self.names)
+        self.period_seconds = [0.0] * len(self.names)
+
+
+    def counters(self):
+        return {
+            name: dict(zip(COUNTERS, values))
+            for name, *values in zip(self.names, self.attempts, self.accepted, self.improvement, self.seconds)
+        }
@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+class OccupancyIndex:
+
+    def __init__(self, state):
+        self.state = state
+        self.all_rooms = (1 << len(state.room_ids)) - 1
+        self.room_orders = {}
+        self.reset()
+
+
+    def reset(self):
+        self.occupied = [0] * self.state.num_periods
+        self.overlaps = defaultdict(int)
+
+
+    def assign(self, room, weekday, timeslot):
+        period = weekday * self.state.periods_per_day + timeslot
+        if self.occupied[period] & (1 << room):
+            self.overlaps[(room, period)] += 1
+        else:
+            self.occupied[period] |= 1 << room
+
+
+    def unassign(self, room, weekday, timeslot):
+        period = weekday * self.state.periods_per_day + timeslot
+        if self.overlaps.get((room, period), 0) > 0:
+            self.overlaps[(room, period)] -= 1
+        else:
+            self.occupied[period] &= ~(1 << room)
+
+
+    def room_order(self, event_capacity): # rooms that fit the event with the least spare seats first, otherwise the closest in capacity
+        if event_capacity not in self.room_orders:
+            room_capacity = self.state.room_capacity
+            rooms = range(len(room_capacity))
+            suitable = sorted((room for room in rooms if room_capacity[room] >= event_capacity), key=lambda room: room_capacity[room] - event_capacity)
+            fallback = sorted(rooms, key=lambda room: abs(room_capacity[room] - event_capacity))
+            self.room_orders[event_capacity] = (
+                sum(1 << room for room in suitable),
+                [(1 << room, room) for room in suitable],
+                [(1 << room, room) for room in fallback]
+            )
+        return self.room_orders[event_capacity]
+
+
+    def available_rooms(self, event_capacity, available_periods):
+        suitable_mask, suitable, fallback = self.room_order(event_capacity)
+        periods_per_day = self.state.periods_per_day
+        period_room_availability = {}
+        for period in available_periods:
+            free = self.all_rooms & ~self.occupied[period[0] * periods_per_day + period[1]]
+            if not free:
+                period_room_availability[period] = []
+            elif free & suitable_mask:
+                period_room_availability[period] = [room for bit, room in suitable if free & bit]
+            else:
+                period_room_availability[period] = [room for bit, room in fallback if free & bit]
+        return period_room_availability
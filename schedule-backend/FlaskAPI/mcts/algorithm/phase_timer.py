@@ -0,0 +1,82 @@
+from algorithm.simulation_results_writer import directory_exists
+from contextlib import contextmanager
+import json
+import os
+import time
+
+class PhaseTimer:
+
+    # Wall time and number of calls per phase. A phase started inside another one is recorded under the outer
+    # phase's name ("search/hill_climbing"), so every entry is inclusive of the phases nested in it. Counters that
+    # are not phases (e.g. the moves tried per neighbourhood) are summed by key alongside them.
+    def __init__(self):
+        self.phases = {}
+        self.stack = []
+        self.counters = {}
+
+
+    @contextmanager
+    def phase(self, name):
+        self.stack.append(name)
+        key = "/".join(self.stack)
+        self.phases.setdefault(key, (0.0, 0)) # listed in the order the phases start
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stack.pop()
+            seconds, count = self.phases[key]
+            self.phases[key] = (seconds + elapsed, count + 1)
+
+
+    def count(self, key, values):
+        totals = self.counters.setdefault(key, {})
+        for name, value in values.items():
+            totals[name] = totals.get(name, 0) + value
+
+
+    def merge(self, phases, prefix = None, counters = None): # adds the phases of another timer, e.g. returned by a worker process
+        for key, (seconds, count) in phases.items():
+            if prefix: key = f"{prefix}/{key}"
+            total_seconds, total_count = self.phases.get(key, (0.0, 0))
+            self.phases[key] = (total_seconds + seconds, total_count + count)
+        for key, values in (counters or {}).items():
+            self.count(f"{prefix}/{key}" if prefix else key, values)
+
+
+    def to_dict(self):
+        return {key: {"seconds": round(seconds, 6), "count": count} for key, (seconds, count) in self.phases.items()}
+
+
+    def counters_to_dict(self):
+        return {key: {name: round(value, 6) for name, value in values.items()} for key, values in self.counters.items()}
+
+
+def timings_filename(input_file, timings_dir = "timings"):
+    return os.path.join(timings_dir, f"{os.path.splitext(input_file)[0]}_timings.json")
+
+
+def save_timings(timer, input_file, run_info, timings_dir = "timings"):
+    directory_exists(timings_dir)
+    with open(timings_filename(input_file, timings_dir), "w") as file:
+        json.dump({"input_file": input_file, **run_info, "phases": timer.to_dict(), "counters": timer.counters_to_dict()}, file, indent=2)
+
+
+def aggregate_timings(input_files, timings_dir = "timings", output_file_name = "timings_summary.json"):
+    directory_exists(timings_dir)
+    runs = []
+    total = PhaseTimer()
+    for input_file in input_files:
+        file_name = timings_filename(input_file, timings_dir)
+        if not os.path.exists(file_name): continue
+        with open(file_name, "r") as file:
+            run = json.load(file)
+        runs.append(run)
+        total.merge({key: (phase["seconds"], phase["count"]) for key, phase in run["phases"].items()}, counters=run.get("counters"))
+
+    output_file_name = os.path.join(timings_dir, output_file_name)
+    with open(output_file_name, "w") as file:
+        json.dump({"runs": runs, "total": total.to_dict(), "counters": total.counters_to_dict()}, file, indent=2)
+    print(f"Phase timings saved to {output_file_name}")
+    return total
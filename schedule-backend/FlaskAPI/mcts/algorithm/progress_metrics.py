@@ -0,0 +1,57 @@
+from algorithm.macros import PROGRESS_CAPACITY
+from array import array
+import csv
+
+COLUMNS = ("iterations", "best_hard", "best_soft", "current_hard", "current_soft")
+
+class ProgressMetrics:
+
+    # Keeps at most `capacity` samples per column. Only every stride-th record is sampled; when the columns are full
+    # every other sample is dropped and the stride doubles, so the samples stay evenly spread over the whole run in
+    # a fixed amount of memory. The last record is always kept so the plots end where the run ended.
+    def __init__(self, capacity = PROGRESS_CAPACITY):
+        self.capacity = capacity
+        self.stride = 1
+        self.records = 0
+        self.columns = {name: array('d') for name in COLUMNS}
+        self.last = None
+
+
+    def record(self, iteration, best_hard, best_soft, current_hard, current_soft):
+        self.last = (iteration, best_hard, best_soft, current_hard, current_soft)
+        self.records += 1
+        if (self.records - 1) % self.stride: return
+
+        if len(self.columns["iterations"]) == self.capacity:
+            for column in self.columns.values():
+                del column[1::2]
+            self.stride *= 2
+            if (self.records - 1) % self.stride: return
+
+        for column, value in zip(self.columns.values(), self.last):
+            column.append(value)
+
+
+    def as_dict(self):
+        metrics = {name: list(column) for name, column in self.columns.items()}
+        if self.last is not None and (not metrics["iterations"] or metrics["iterations"][-1] != self.last[0]):
+            for name, value in zip(COLUMNS, self.last):
+                metrics[name].append(value)
+        return metrics
+
+
+    def save(self, filename): # columnar CSV, one row per sample, for plotting offline
+        metrics = self.as_dict()
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            writer.writerows(zip(*(metrics[name] for name in COLUMNS)))
+
+
+def load_progress(filename):
+    metrics = {name: [] for name in COLUMNS}
+    with open(filename, "r", newline="") as file:
+        for row in csv.DictReader(file):
+            for name in COLUMNS:
+                metrics[name].append(float(row[name]))
+    return metrics
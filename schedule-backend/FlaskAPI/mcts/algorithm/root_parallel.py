@@ -0,0 +1,99 @@
+from algorithm.mcts import MCTS
+from algorithm.macros import DEBUG_LOG
+from algorithm.phase_timer import PhaseTimer
+from algorithm.simulation_results_writer import log_filename
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from multiprocessing import Manager
+import os
+import random
+import shutil
+
+def worker_output_filename(output_filename, worker_id):
+    head, tail = os.path.split(output_filename)
+    name, _, suffix = tail.partition('_')
+    return os.path.join(head, f"{name}-w{worker_id}_{suffix}")
+
+
+class RootSynchronizer:
+
+    # Publishes the worker's own root child statistics to the shared dict and adds the other workers'
+    # statistics to the matching root children, remembering what was added so it is never counted twice
+    def __init__(self, worker_id, shared_stats):
+        self.worker_id = worker_id
+        self.shared_stats = shared_stats
+        self.external = {}
+
+
+    def __call__(self, mcts):
+        root = mcts.root
+        children = [child for child in root.children if child]
+
+        own_stats = {}
+        for child in children:
+            visits, score_hard, score_soft = self.external.get(child.assignment, (0, 0, 0))
+            own_stats[child.assignment] = (child.visits - visits, child.score_hard - score_hard, child.score_soft - score_soft)
+        self.shared_stats[self.worker_id] = (mcts.global_best_hard_penalty, mcts.global_best_soft_penalty, own_stats)
+
+        totals = {}
+        optimal_found = False
+        for worker_id, (best_hard, best_soft, stats) in self.shared_stats.items():
+            if worker_id == self.worker_id: continue
+            optimal_found = optimal_found or (best_hard == 0 and best_soft == 0)
+            for assignment, (visits, score_hard, score_soft) in stats.items():
+                total_visits, total_hard, total_soft = totals.get(assignment, (0, 0, 0))
+                totals[assignment] = (total_visits + visits, total_hard + score_hard, total_soft + score_soft)
+
+        for child in children:
+            if child.assignment not in totals: continue
+            visits, score_hard, score_soft = totals[child.assignment]
+            old_visits, old_hard, old_soft = self.external.get(child.assignment, (0, 0, 0))
+            child.visits += visits - old_visits
+            child.score_hard += score_hard - old_hard
+            child.score_soft += score_soft - old_soft
+            root.visits += visits - old_visits
+            self.external[child.assignment] = (visits, score_hard, score_soft)
+
+        return optimal_found
+
+
+def run_worker(worker_id, current_timetable, config, seed, shared_stats):
+    random.seed(seed) # same seed for every worker while ordering the events, so all of them share the same root children
+    mcts = MCTS(current_timetable, config)
+    random.seed(seed + worker_id)
+
+    mcts.run_mcts(RootSynchronizer(worker_id, shared_stats))
+    return worker_id, mcts.global_best_hard_penalty, mcts.global_best_soft_penalty, mcts.timer.phases, mcts.timer.counters
+
+
+def run_root_parallel(current_timetable, config, workers, seed = None, timer = None):
+    if timer is None: timer = PhaseTimer()
+    if seed is None: seed = random.randrange(2**32)
+
+    worker_configs = []
+    for worker_id in range(workers):
+        worker_config = replace(config, output_filename=worker_output_filename(config.output_filename, worker_id))
+        if DEBUG_LOG:
+            with open(log_filename(worker_config.output_filename), "w") as file:
+                file.write("")
+        worker_configs.append(worker_config)
+
+    with timer.phase("search"), Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+        shared_stats = manager.dict()
+        futures = [executor.submit(run_worker, worker_id, current_timetable, worker_configs[worker_id], seed, shared_stats) for worker_id in range(workers)]
+        results = [future.result() for future in futures]
+
+    for _, _, _, phases, counters in results: # summed over the workers, which ran at the same time
+        timer.merge(phases, "workers", counters)
+
+    best_worker, best_hard, best_soft, _, _ = max(results, key=lambda result: (result[1], result[2]))
+    best_output = worker_configs[best_worker].output_filename
+    print(f"Best result from worker {best_worker}: Hard: {best_hard}, Soft: {best_soft}")
+
+    if os.path.exists(best_output):
+        shutil.copyfile(best_output, config.output_filename)
+    if DEBUG_LOG and os.path.exists(log_filename(best_output)):
+        with open(log_filename(best_output), "r") as worker_log, open(log_filename(config.output_filename), "a") as file:
+            file.writelines(worker_log.readlines()[-1:])
+
+    return best_hard, best_soft
@@ -1,29 +1,146 @@
+import atexit
+import json
 import os
+import threading
 import time
-from datetime import datetime
-from algorithm.macros import DEBUG_LOG
-
-def write_simulation_results(output_filename, assigned_events, start_time, hard_penalty_result, soft_penalty_result):
-    if DEBUG_LOG:
-        _, tail = os.path.split(output_filename)
-        input_file_name = tail.split('_')[0]
-        log_file_name = os.path.join("log", f"{input_file_name}_log.txt")
-        
-        start_dt = datetime.fromtimestamp(start_time)
-        current_dt = datetime.fromtimestamp(time.time())
-
-        with open(log_file_name, 'a') as file:
-            file.write(f"Time: {current_dt - start_dt}, Hard: {hard_penalty_result}, Soft: {soft_penalty_result}\n")
-    
-    with open(output_filename, 'w') as file:
-        for event in assigned_events:
-            if event['RoomId'] is not None or event['WeekDay'] is not None or event['Timeslot'] is not None:
-                file.write(f"{event['Name']} {event['RoomId']} {event['WeekDay']} {event['Timeslot']}\n")
-
-
-def directory_exists(directory):
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+from algorithm.macros import DEBUG_LOG, WRITE_INTERVAL
+
+def log_filename(output_filename):
+    _, tail = os.path.split(output_filename)
+    return os.path.join("log", f"{tail.split('_')[0]}_log.jsonl")
+
+
+def read_last_progress_record(filename, chunk_size = 4096):
+    # Reads the file backwards a chunk at a time and returns the last line that parses, so the cost does not depend
+    # on the length of the log and a record cut off by a killed run falls back to the one before it.
+    # Records: timestamp, elapsed seconds, iteration, hard, soft and phase.
+    if not os.path.exists(filename): return None
+    with open(filename, "rb") as file:
+        position = file.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0:
+            size = min(chunk_size, position)
+            position -= size
+            file.seek(position)
+            lines = (file.read(size) + data).split(b"\n")
+            data = lines.pop(0) if position > 0 else b"" # may still be missing its start
+            for line in reversed(lines):
+                if not line.strip(): continue
+                try:
+                    return json.loads(line)
+                except ValueError:
+                    pass
+    return None
+
+
+class ProgressLog:
+
+    # Long-lived buffered handle on the JSONL progress log, flushed after each batch of records
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+
+    def write(self, records):
+        if self.file is None: self.file = open(self.filename, 'a')
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def write_timetable(output_filename, timetable): # written next to the output and renamed over it, so readers never see a partial file
+    temporary_filename = f"{output_filename}.tmp"
+    with open(temporary_filename, 'w') as file:
+        for name, room_id, weekday, timeslot in timetable:
+            file.write(f"{name} {room_id} {weekday} {timeslot}\n")
+    os.replace(temporary_filename, output_filename)
+
+
+class SolutionWriter:
+
+    # Writes the best timetables from a background thread so the search never waits on file I/O. Only the latest
+    # timetable is kept and it is written at most once every WRITE_INTERVAL seconds, while every progress record is
+    # kept and appended in batches. close() writes whatever is still pending; it also runs at exit while the thread is up.
+    def __init__(self, output_filename, interval = WRITE_INTERVAL):
+        self.output_filename = output_filename
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.latest = None
+        self.records = []
+        self.iteration = 0
+        self.closing = False
+        self.thread = None
+
+
+    # the hill climbing runs inside an MCTS iteration, so its records keep the iteration of the last MCTS record
+    def submit(self, state, start_time, hard_penalty_result, soft_penalty_result, phase = "mcts", iteration = None):
+        # snapshot, the state keeps changing while the timetable waits to be written
+        self.submit_timetable(state.timetable(), start_time, hard_penalty_result, soft_penalty_result, phase, iteration)
+
+
+    def submit_timetable(self, timetable, start_time, hard_penalty_result, soft_penalty_result, phase = "mcts", iteration = None):
+        if iteration is not None: self.iteration = iteration
+        with self.condition:
+            self.latest = timetable
+            if DEBUG_LOG:
+                now = time.time()
+                self.records.append({"timestamp": round(now, 3), "elapsed": round(now - start_time, 3), "iteration": self.iteration,
+                                     "hard": hard_penalty_result, "soft": soft_penalty_result, "phase": phase})
+            if self.thread is None: # started on the first submit, searches that never improve do not need it
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+                atexit.register(self.close) # until close(), so closed writers are not kept alive until exit
+            self.condition.notify()
+
+
+    def _run(self):
+        progress_log = ProgressLog(log_filename(self.output_filename))
+        last_write = float('-inf')
+        while True:
+            with self.condition:
+                while self.latest is None and not self.records and not self.closing:
+                    self.condition.wait()
+                if self.latest is None and not self.records:
+                    progress_log.close()
+                    return
+
+                while not self.closing and last_write + self.interval > time.monotonic():
+                    self.condition.wait(last_write + self.interval - time.monotonic())
+
+                timetable, self.latest = self.latest, None
+                records, self.records = self.records, []
+
+            try:
+                if records:
+                    progress_log.write(records)
+                if timetable is not None:
+                    write_timetable(self.output_filename, timetable)
+            except OSError as e:
+                print(f"Error: could not write {self.output_filename}: {e}")
+            last_write = time.monotonic()
+
+
+    def close(self):
+        with self.condition:
+            thread = self.thread
+            if thread is None: return
+            self.closing = True
+            self.condition.notify()
+        thread.join()
+        atexit.unregister(self.close)
+        with self.condition:
+            self.thread = None
+            self.closing = False
+
+
+def directory_exists(directory): # --jobs processes may create the same folder at the same time
+    os.makedirs(directory, exist_ok=True)
 
 
 """ def write_best_final_solution_to_file(best_solution, file):
@@ -0,0 +1,125 @@
+from array import array
+
+class TimetableState:
+
+    __slots__ = (
+        "days", "periods_per_day", "num_periods", "room_ids", "room_index", "room_capacity",
+        "course_names", "course_index", "course_events", "course_min_days", "course_unavailable", "teacher_index",
+        "course", "teacher", "capacity", "curriculum_courses", "course_curricula",
+        "room", "weekday", "timeslot", "period_events", "assigned_count", "evaluator", "occupancy"
+    )
+
+    def __init__(self, events, rooms, blocks, days, periods_per_day):
+        self.days = days
+        self.periods_per_day = periods_per_day
+        self.num_periods = days * periods_per_day
+
+        self.room_ids = list(rooms.keys())
+        self.room_index = {room_id: i for i, room_id in enumerate(self.room_ids)}
+        self.room_capacity = array('i', (rooms[room_id]["Capacity"] for room_id in self.room_ids))
+
+        self.course_names = []
+        self.course_index = {}
+        self.course_events = []
+        self.course_min_days = array('h')
+        self.course_unavailable = [] # bitmask over the flat periods, the complement of Available_Periods
+        self.teacher_index = {}
+
+        num_events = len(events)
+        self.course = array('h', [0]) * num_events
+        self.teacher = array('h', [0]) * num_events
+        self.capacity = array('i', [0]) * num_events
+
+        for event in sorted(events, key=lambda event: event["Id"]):
+            if event["Name"] not in self.course_index:
+                self.course_index[event["Name"]] = len(self.course_names)
+                self.course_names.append(event["Name"])
+                self.course_events.append([])
+                self.course_min_days.append(event["MinWorkingDays"])
+                available = sum(1 << (weekday * periods_per_day + timeslot) for weekday, timeslot in event["Available_Periods"])
+                self.course_unavailable.append(((1 << self.num_periods) - 1) & ~available)
+            if event["Teacher"] not in self.teacher_index:
+                self.teacher_index[event["Teacher"]] = len(self.teacher_index)
+
+            course = self.course_index[event["Name"]]
+            self.course[event["Id"]] = course
+            self.teacher[event["Id"]] = self.teacher_index[event["Teacher"]]
+            self.capacity[event["Id"]] = event["Capacity"]
+            self.course_events[course].append(event["Id"])
+
+        self.curriculum_courses = [[self.course_index[name] for name in block["Events"] if name in self.course_index] for block in blocks.values()]
+        self.course_curricula = [[] for _ in self.course_names]
+        for curriculum, courses in enumerate(self.curriculum_courses):
+            for course in courses:
+                self.course_curricula[course].append(curriculum)
+
+        self.room = array('h', [-1]) * num_events
+        self.weekday = array('h', [-1]) * num_events
+        self.timeslot = array('h', [-1]) * num_events
+        self.period_events = [set() for _ in range(self.num_periods)]
+        self.assigned_count = 0
+
+        self.evaluator = None
+        self.occupancy = None
+
+
+    def copy(self): # shares the instance tables, copies only the assignment columns
+        state = TimetableState.__new__(TimetableState)
+        for name in TimetableState.__slots__:
+            setattr(state, name, getattr(self, name))
+        state.room, state.weekday, state.timeslot = array('h', self.room), array('h', self.weekday), array('h', self.timeslot)
+        state.period_events = [set(events) for events in self.period_events]
+        state.evaluator = state.occupancy = None
+        return state
+
+
+    def clear(self):
+        for column in (self.room, self.weekday, self.timeslot):
+            column[:] = array('h', [-1]) * len(column)
+        for events in self.period_events:
+            events.clear()
+        self.assigned_count = 0
+        if self.evaluator is not None: self.evaluator.reset()
+        if self.occupancy is not None: self.occupancy.reset()
+
+
+    def is_assigned(self, event_id):
+        return self.room[event_id] >= 0
+
+
+    def events_at(self, weekday, timeslot):
+        return self.period_events[weekday * self.periods_per_day + timeslot]
+
+
+    def assigned_events(self):
+        return [event_id for event_id, room in enumerate(self.room) if room >= 0]
+
+
+    def assign(self, event_id, room, weekday, timeslot):
+        self.room[event_id], self.weekday[event_id], self.timeslot[event_id] = room, weekday, timeslot
+        self.period_events[weekday * self.periods_per_day + timeslot].add(event_id)
+        self.assigned_count += 1
+        if self.occupancy is not None: self.occupancy.assign(room, weekday, timeslot)
+        if self.evaluator is not None: return self.evaluator.assign(event_id, room, weekday, timeslot)
+        return 0, 0
+
+
+    def unassign(self, event_id):
+        room, weekday, timeslot = self.room[event_id], self.weekday[event_id], self.timeslot[event_id]
+        self.room[event_id] = self.weekday[event_id] = self.timeslot[event_id] = -1
+        self.period_events[weekday * self.periods_per_day + timeslot].discard(event_id)
+        self.assigned_count -= 1
+        if self.occupancy is not None: self.occupancy.unassign(room, weekday, timeslot)
+        if self.evaluator is not None: return self.evaluator.unassign(event_id, room, weekday, timeslot)
+        return 0, 0
+
+
+    def move(self, event_id, room, weekday, timeslot):
+        hard_removed, soft_removed = self.unassign(event_id)
+        hard_added, soft_added = self.assign(event_id, room, weekday, timeslot)
+        return hard_removed + hard_added, soft_removed + soft_added
+
+
+    def timetable(self):
+        return [(self.course_names[self.course[event_id]], self.room_ids[room], self.weekday[event_id], self.timeslot[event_id])
+                for event_id, room in enumerate(self.room) if room >= 0]
@@ -0,0 +1,47 @@
+from algorithm.macros import TREE_EXPORT_MAX_DEPTH, TREE_EXPORT_MIN_VISITS
+import csv
+import heapq
+
+FIELDS = ("id", "parent", "depth", "visits", "score_hard", "score_soft", "best_hard", "best_soft", "expansion_limit", "event", "weekday", "timeslot", "room")
+
+def export_tree(root, filename, max_depth = TREE_EXPORT_MAX_DEPTH, min_visits = TREE_EXPORT_MIN_VISITS):
+    # Depth-first walk with an explicit stack that writes every node as soon as it is reached, so neither the
+    # recursion limit nor the size of the tree matters. Ids follow the preorder, so parents come before their
+    # children. A child below min_visits is skipped with its whole subtree, its descendants have even fewer visits.
+    count = 0
+    with open(filename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDS)
+        stack = [(root, -1)]
+        while stack:
+            node, parent_id = stack.pop()
+            node_id = count
+            count += 1
+
+            assignment = node.assignment if node.assignment is not None else ("", "", "", "")
+            writer.writerow((node_id, parent_id, node.depth, node.visits, round(node.score_hard, 6), round(node.score_soft, 6),
+                             node.best_hard_penalty, node.best_soft_penalty, node.expansion_limit, *assignment))
+
+            if max_depth is not None and node.depth >= max_depth: continue
+            children = [child for child in node.children if child and child.visits >= min_visits]
+            stack.extend((child, node_id) for child in reversed(children))
+    return count
+
+
+def load_top_visited(filename, top_k):
+    # Streams the export keeping the top_k most visited nodes, ties going to the lower id. A parent has at least the
+    # visits of its children and a lower id, so it always ranks above them and the selection is a subtree of the root.
+    heap = []
+    with open(filename, "r", newline="") as file:
+        for row in csv.DictReader(file):
+            key = (int(row["visits"]), -int(row["id"]))
+            if len(heap) < top_k:
+                heapq.heappush(heap, (key, row))
+            elif key > heap[0][0]:
+                heapq.heapreplace(heap, (key, row))
+
+    nodes = {}
+    for _, row in sorted(heap, key=lambda entry: -entry[0][1]): # preorder, parents first
+        if int(row["parent"]) == -1 or int(row["parent"]) in nodes:
+            nodes[int(row["id"])] = row
+    return nodes
@@ -0,0 +1,138 @@
+from algorithm.mcts import MCTS
+from algorithm.macros import DIVING, DEBUG_PROGRESS, DEBUG_PROFILER, VIRTUAL_LOSS
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import cProfile
+import os
+import random
+import time
+
+_worker_mcts = None
+
+def init_worker(current_timetable, config, seed):
+    global _worker_mcts
+    random.seed(seed) # same event order as the coordinator, so depths index the same events
+    _worker_mcts = MCTS(current_timetable, config)
+    random.seed(seed + os.getpid())
+
+
+def rollout_worker(path, depth, previous_unassigned_events, priorities):
+    mcts = _worker_mcts
+    mcts.previous_unassigned_events = set(previous_unassigned_events)
+    for event, priority in zip(mcts.events, priorities):
+        event["Priority"] = priority
+
+    mcts.restore_path(path)
+    simulated_events, unassigned_events = mcts.rollout(depth)
+
+    state = mcts.state
+    simulated_path = [(event_id, state.weekday[event_id], state.timeslot[event_id], state.room[event_id]) for event_id in simulated_events]
+    return simulated_path, list(unassigned_events)
+
+
+class TreeParallelMCTS:
+
+    # The coordinator owns the tree and runs selection, expansion and backpropagation; the rollouts run in the
+    # worker processes. Every in-flight rollout adds a virtual loss along its path so the next selections spread
+    # over other branches, and its result is processed on the coordinator exactly as a sequential simulation.
+    def __init__(self, current_timetable, config, workers, seed = None, timer = None):
+        self.current_timetable = current_timetable
+        self.config = config
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(2**32)
+
+        random.seed(self.seed)
+        self.mcts = MCTS(current_timetable, config, timer)
+        self.events_by_id = {event["Id"]: event for event in self.mcts.events}
+        self.pending = {}
+
+
+    def submit_rollout(self, executor, leaf):
+        mcts = self.mcts
+        return executor.submit(
+            rollout_worker,
+            mcts.node_path(leaf),
+            leaf.depth,
+            list(mcts.previous_unassigned_events),
+            [event["Priority"] for event in mcts.events]
+        )
+
+
+    def process_rollout(self, leaf, is_fully_expanded, rollout, start_time):
+        mcts = self.mcts
+        simulated_path, unassigned_events = rollout
+
+        mcts.current_node = leaf
+        if DIVING: mcts.is_current_node_fully_expanded = is_fully_expanded
+        mcts.restore_path(mcts.node_path(leaf) + simulated_path)
+        for event_id in unassigned_events:
+            mcts.mark_unassigned(self.events_by_id[event_id])
+
+        return mcts.process_simulation_results(
+            [event_id for event_id, _, _, _ in simulated_path], set(unassigned_events), start_time, mcts.params.time_limit
+        )
+
+
+    def optimal_found(self):
+        return self.mcts.global_best_hard_penalty == 0 and self.mcts.global_best_soft_penalty == 0
+
+
+    def start(self):
+        if DEBUG_PROFILER:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.current_timetable, self.config, self.seed))
+
+
+    def finish(self, executor):
+        executor.shutdown(wait=True, cancel_futures=True)
+        self.mcts.close_writer()
+        self.mcts.count_neighborhoods()
+        self.mcts.save_debug_outputs(self.profiler if DEBUG_PROFILER else None)
+        return self.mcts.global_best_hard_penalty, self.mcts.global_best_soft_penalty
+
+
+    def run(self):
+        mcts = self.mcts
+        params = mcts.params
+
+        executor = self.start()
+        try:
+            with mcts.timer.phase("search"):
+                start_time = time.time()
+                full_tree = optimal_found = False
+                i = 0
+                while not optimal_found:
+                    while (not full_tree and len(self.pending) < self.workers and time.time() - start_time <= params.time_limit
+                           and (params.iterations is None or i + len(self.pending) < params.iterations)):
+                        if not mcts.selection():
+                            print("Full tree!\n")
+                            full_tree = True
+                        elif mcts.expansion():
+                            leaf = mcts.current_node
+                            leaf.add_virtual_loss(VIRTUAL_LOSS)
+                            self.pending[self.submit_rollout(executor, leaf)] = (leaf, mcts.is_current_node_fully_expanded if DIVING else False)
+                        else:
+                            i += 1
+
+                    if not self.pending: break
+
+                    done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        leaf, is_fully_expanded = self.pending.pop(future)
+                        leaf.add_virtual_loss(-VIRTUAL_LOSS)
+                        simulation_hard, simulation_soft = self.process_rollout(leaf, is_fully_expanded, future.result(), start_time)
+                        if self.optimal_found():
+                            print("Optimal solution found!\n")
+                            optimal_found = True
+                            break
+                        leaf.backpropagate(simulation_hard, simulation_soft)
+                        if DEBUG_PROGRESS: mcts.update_progress_metrics(i+1)
+                        i += 1
+        except KeyboardInterrupt:
+            print("Execution interrupted by user.\n")
+
+        return self.finish(executor)
+
+
+def run_tree_parallel(current_timetable, config, workers, seed = None, timer = None):
+    return TreeParallelMCTS(current_timetable, config, workers, seed, timer).run()
@@ -0,0 +1,210 @@
+import algorithm.mcts as mcts_module
+from algorithm.mcts import MCTS, MCTSConfig, Params
+from algorithm.mcts_node import MCTSNode
+from algorithm.array_tree import ArrayTree
+from algorithm.utils import add_event_ids_and_priority
+from algorithm.local_search import LOCAL_SEARCH_ENGINES
+from algorithm.simulation_results_writer import directory_exists
+from algorithm.macros import DEBUG_LOG
+from mcts_input_parser import parse_input_data, reset_db
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+import timeit
+
+def load_instance(input_file, input_dir = "input"):
+    with open(os.path.join(input_dir, input_file), "r") as f:
+        db = reset_db()
+        days, periods_per_day = parse_input_data(f.read(), db)
+    return db, days, periods_per_day
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_nodes(root):
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for child in node.children if child)
+    return count
+
+
+def memory_benchmark(args):
+    # the debug outputs would add their own allocations to the peak, and hill climbing only stops when idle
+    mcts_module.DEBUG_TREE = mcts_module.DEBUG_PROGRESS = mcts_module.DEBUG_PROFILER = False
+    mcts_module.HILL_CLIMBING = args.hill_climbing
+    mcts_module.CHECKPOINT_INTERVAL = None
+
+    if DEBUG_LOG: directory_exists("log")
+
+    random.seed(args.seed)
+    db, days, periods_per_day = load_instance(args.input_file)
+    rss_before = peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_file = os.path.join(output_dir, f"{os.path.splitext(args.input_file)[0]}_output.txt")
+        mcts = MCTS(db, MCTSConfig(Params(args.c_param, args.iterations, args.time_limit), days, periods_per_day, output_file))
+        start_time = time.time()
+        mcts.run_mcts()
+        duration = time.time() - start_time
+
+    print(f"{args.input_file}: {args.iterations} iterations in {duration:.1f}s, {count_nodes(mcts.root)} nodes")
+    print(f"Peak RSS: {rss_before:.1f} MB after parsing, {peak_rss_mb():.1f} MB after the run")
+    print(f"Best result: {mcts.global_best_hard_penalty} hard, {mcts.global_best_soft_penalty} soft")
+
+
+def wide_trees(width, rng):
+    node, tree = MCTSNode(width), ArrayTree(width)
+    for child in range(width):
+        visits = rng.randint(1, 1000)
+        score_hard, score_soft = rng.random() * visits, rng.random() * visits
+        for parent in (node, tree.root):
+            parent_child = parent.add_child(1, (child, 0, 0, 0))
+            parent_child.visits, parent_child.score_hard, parent_child.score_soft = visits, score_hard, score_soft
+            parent.visits += visits
+    return node, tree
+
+
+def uct_benchmark(args):
+    rng = random.Random(args.seed)
+    print(f"{'width':>6} {'node':>10} {'node vec':>10} {'array':>10} {'array vec':>10}   (us per selection)")
+
+    for width in args.widths:
+        node, tree = wide_trees(width, rng)
+        children = node.children
+        indices = list(tree.children(tree.root.index))
+
+        selections = {
+            "node": lambda: node.best_child(children, args.c_param),
+            "node vec": lambda: node.best_child_vectorized(children, args.c_param),
+            "array": lambda: tree.best_child(tree.root.index, indices, args.c_param),
+            "array vec": lambda: tree.best_child_vectorized(tree.root.index, indices, args.c_param),
+        }
+        chosen = {children.index(selections["node"]()), children.index(selections["node vec"]()), indices.index(selections["array"]()), indices.index(selections["array vec"]())}
+        if len(chosen) != 1: raise AssertionError(f"Selections disagree for width {width}: {chosen}")
+
+        timings = [min(timeit.repeat(select, number=args.number, repeat=5)) / args.number * 1e6 for select in selections.values()]
+        print(f"{width:>6} " + " ".join(f"{timing:>10.1f}" for timing in timings))
+
+
+def startup_benchmark(args):
+    print(f"{'instance':>10} {'lectures':>9} {'parse':>8} {'events':>8} {'MCTS':>8}   (s)")
+    totals = [0, 0, 0]
+    for input_file in args.input_files:
+        random.seed(args.seed)
+        start_time = time.perf_counter()
+        db, days, periods_per_day = load_instance(input_file)
+        parsed_time = time.perf_counter()
+        events = add_event_ids_and_priority(db["events"], days, periods_per_day, db["blocks"], db["constraints"])
+        events_time = time.perf_counter()
+        MCTS(db, MCTSConfig(Params(), days, periods_per_day))
+        mcts_time = time.perf_counter()
+
+        timings = [parsed_time - start_time, events_time - parsed_time, mcts_time - events_time]
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(f"{input_file:>10} {len(events):>9} " + " ".join(f"{timing:>8.3f}" for timing in timings))
+    print(f"{'total':>10} {'':>9} " + " ".join(f"{total:>8.3f}" for total in totals))
+
+
+class CountingWriter: # the engines report each new best to the writer, the benchmark only counts them
+
+    def __init__(self):
+        self.improvements = 0
+
+
+    def submit(self, *args, **kwargs):
+        self.improvements += 1
+
+
+def feasible_start(mcts, attempts):
+    # greedy rollouts from an empty timetable until one is complete and feasible, as the ones hill climbing starts from
+    for _ in range(attempts):
+        mcts.state.clear()
+        simulated_events, unassigned_events = mcts.rollout(0)
+        hard_penalty, soft_penalty = mcts.state.evaluator.penalties(unassigned_events)
+        if not unassigned_events and hard_penalty == 0:
+            path = [(event_id, mcts.state.weekday[event_id], mcts.state.timeslot[event_id], mcts.state.room[event_id]) for event_id in simulated_events]
+            return path, simulated_events, soft_penalty
+    return None
+
+
+def local_search_benchmark(args):
+    mcts_module.CHECKPOINT_INTERVAL = None
+    print(f"{'instance':>10} {'start':>7} " + " ".join(f"{engine:>20}" for engine in args.engines) + f"   (soft penalty after {args.time_limit}s)")
+    totals = {engine: 0 for engine in args.engines}
+    solved = 0
+    for input_file in args.input_files:
+        random.seed(args.seed)
+        db, days, periods_per_day = load_instance(input_file)
+        mcts = MCTS(db, MCTSConfig(Params(), days, periods_per_day))
+        start = feasible_start(mcts, args.attempts)
+        if start is None:
+            print(f"{input_file:>10} no feasible start in {args.attempts} rollouts")
+            continue
+        path, simulated_events, start_soft = start
+        solved += 1
+
+        results = []
+        for engine_name in args.engines:
+            random.seed(args.seed)
+            mcts.restore_path(path)
+            writer = CountingWriter()
+            engine = LOCAL_SEARCH_ENGINES[engine_name](mcts.conflicts_checker, mcts.events, days, writer)
+            engine.selector.adaptive = args.adaptive_weights
+            # every engine gets the whole time limit, the ones that stop when idle start again from their best
+            result = start_soft
+            start_time = time.time()
+            while result < 0 and time.time() - start_time < args.time_limit:
+                result = engine.run_hill_climbing(mcts.state, simulated_events, result, start_time, args.time_limit)
+            totals[engine_name] += result
+            results.append(f"{result:>7} ({writer.improvements:>4} best)")
+        print(f"{input_file:>10} {start_soft:>7} " + " ".join(f"{result:>20}" for result in results))
+    if solved:
+        print(f"{'mean':>10} {'':>7} " + " ".join(f"{totals[engine] / solved:>20.1f}" for engine in args.engines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the MCTS timetabling solver.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    memory = subparsers.add_parser("memory", help="Peak RSS of a fixed number of MCTS iterations")
+    memory.add_argument("--input_file", default="comp07.ctt", help="Input file to process (default: comp07.ctt)")
+    memory.add_argument("--iterations", type=int, default=200, help="Number of iterations for the MCTS run (default: 200)")
+    memory.add_argument("--time_limit", type=int, default=3600, help="Time limit in seconds for the MCTS run (default: 3600 seconds)")
+    memory.add_argument("--c_param", type=float, default=1.4, help="C parameter for the MCTS run")
+    memory.add_argument("--seed", type=int, default=42, help="Seed for random number generation (default: 42)")
+    memory.add_argument("--hill_climbing", action="store_true", help="Run hill climbing on feasible simulations")
+    memory.set_defaults(run=memory_benchmark)
+
+    uct = subparsers.add_parser("uct", help="Scalar vs vectorized UCT child selection over wide nodes (needs numpy)")
+    uct.add_argument("--widths", type=int, nargs="+", default=[10, 50, 200, 500, 1000, 5000], help="Numbers of children per node (default: 10 50 200 500 1000 5000)")
+    uct.add_argument("--number", type=int, default=200, help="Selections per timing (default: 200)")
+    uct.add_argument("--c_param", type=float, default=1.4, help="C parameter for the UCT weights")
+    uct.add_argument("--seed", type=int, default=42, help="Seed for the random child statistics (default: 42)")
+    uct.set_defaults(run=uct_benchmark)
+
+    startup = subparsers.add_parser("startup", help="Time spent parsing and preparing each instance before the search starts")
+    startup.add_argument("--input_files", nargs="+", default=[f"comp{str(i+1).zfill(2)}.ctt" for i in range(21)], help="List of input files to process (default: comp01.ctt - comp21.ctt)")
+    startup.add_argument("--seed", type=int, default=42, help="Seed for random number generation (default: 42)")
+    startup.set_defaults(run=startup_benchmark)
+
+    local_search = subparsers.add_parser("local_search", help="Soft penalty reached by each local search engine from the same feasible timetable in the same time")
+    local_search.add_argument("--input_files", nargs="+", default=[f"comp{str(i+1).zfill(2)}.ctt" for i in range(21)], help="List of input files to process (default: comp01.ctt - comp21.ctt)")
+    local_search.add_argument("--engines", nargs="+", choices=list(LOCAL_SEARCH_ENGINES), default=list(LOCAL_SEARCH_ENGINES), help="Engines to compare (default: all)")
+    local_search.add_argument("--time_limit", type=float, default=30, help="Seconds given to each engine on each instance (default: 30)")
+    local_search.add_argument("--attempts", type=int, default=50, help="Greedy rollouts tried to find a feasible starting timetable (default: 50)")
+    local_search.add_argument("--adaptive_weights", action="store_true", help="Adapt the neighbourhood weights during the runs instead of keeping the initial ones")
+    local_search.add_argument("--seed", type=int, default=42, help="Seed for random number generation (default: 42)")
+    local_search.set_defaults(run=local_search_benchmark)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
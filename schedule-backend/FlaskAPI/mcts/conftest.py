@@ -0,0 +1 @@
+# Lets pytest import the modules of this folder (algorithm, benchmark, ...) as the scripts do
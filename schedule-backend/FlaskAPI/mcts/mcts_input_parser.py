@@ -1,8 +1,17 @@
 from algorithm.mcts import *
+from algorithm.root_parallel import run_root_parallel
+from algorithm.tree_parallel import run_tree_parallel
+from algorithm.leaf_parallel import run_leaf_parallel
+from algorithm.local_search_portfolio import LocalSearchPortfolio
 from algorithm.simulation_results_writer import directory_exists
-from algorithm.macros import DEBUG_EXCEL, DEBUG_LOG
+from algorithm.phase_timer import PhaseTimer, save_timings, aggregate_timings
+from algorithm.checkpoint import checkpoint_filename
+from algorithm.macros import DEBUG_EXCEL, DEBUG_LOG, DEBUG_TIMINGS, LOCAL_SEARCH
+from algorithm.local_search import LOCAL_SEARCH_ENGINES
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import argparse
 import os
+import time
 
 def reset_db():
     return {
@@ -81,21 +90,32 @@ def parse_input_data(input_data, db):
     return days, periods_per_day
 
 
-def process_file(input_file, input_dir, output_dir, log_dir, params):
+def process_file(input_file, input_dir, output_dir, log_dir, params, workers = 1, parallel_mode = "root", seed = None, resume = False, local_search = LOCAL_SEARCH, local_search_workers = 0):
     input_file_path = os.path.join(input_dir, input_file)
     if not os.path.exists(input_file_path):
         print(f"Warning: The input file '{input_file_path}' does not exist. Skipping.")
         return
 
     print(f"Processing {input_file}...")
-    with open(input_file_path, "r") as f:
+    timer = PhaseTimer()
+    with timer.phase("parse"), open(input_file_path, "r") as f:
         db = reset_db()
         days, periods_per_day = parse_input_data(f.read(), db)
 
     output_file = os.path.join(output_dir, f"{os.path.splitext(input_file)[0]}_output.txt")
-    
-    if DEBUG_LOG:
-        log_file = os.path.join(log_dir, f"{os.path.splitext(input_file)[0]}_log.txt")
+
+    if resume and workers > 1:
+        print(f"Warning: --resume only applies to runs with a single worker. Starting {input_file} from scratch.")
+        resume = False
+    if local_search_workers > 0 and workers > 1:
+        print(f"Warning: --local_search_workers only applies to runs with a single worker. Running {input_file} without them.")
+        local_search_workers = 0
+    if resume and not os.path.exists(checkpoint_filename(output_file)):
+        print(f"Warning: No checkpoint found for {input_file}. Starting from scratch.")
+        resume = False
+
+    if DEBUG_LOG and not resume:
+        log_file = os.path.join(log_dir, f"{os.path.splitext(input_file)[0]}_log.jsonl")
         with open(log_file, "w") as file:
             file.write("")
     
@@ -103,14 +123,55 @@ def process_file(input_file, input_dir, output_dir, log_dir, params):
         params = params,
         days = days,
         periods_per_day = periods_per_day,
-        output_filename = output_file
+        output_filename = output_file,
+        local_search = local_search
     )
-    mcts = MCTS(db, config)
-    mcts.run_mcts()
+    start_time = time.perf_counter()
+    if workers > 1 and parallel_mode == "tree":
+        run_tree_parallel(db, config, workers, seed, timer)
+    elif workers > 1 and parallel_mode == "leaf":
+        run_leaf_parallel(db, config, workers, seed, timer)
+    elif workers > 1:
+        run_root_parallel(db, config, workers, seed, timer)
+    else:
+        mcts = MCTS(db, config, timer)
+        if resume:
+            mcts.resume()
+            print(f"Resuming {input_file} from iteration {mcts.iteration} ({mcts.elapsed:.1f} seconds in).")
+        portfolio = LocalSearchPortfolio(db, config, local_search_workers, seed) if local_search_workers > 0 else None
+        mcts.run_mcts(portfolio=portfolio)
+
+    if DEBUG_TIMINGS:
+        run_info = {"workers": workers, "parallel_mode": parallel_mode if workers > 1 else None, "seed": seed, "local_search": local_search, "local_search_workers": local_search_workers,
+                    "time_limit": params.time_limit, "iterations": params.iterations, "run_seconds": round(time.perf_counter() - start_time, 6)}
+        save_timings(timer, input_file, run_info)
 
     print(f"Finished processing {input_file}, output saved to {output_file}.")
 
 
+def process_file_in_worker(input_file, input_dir, output_dir, log_dir, params, workers, parallel_mode, seed, resume, local_search, local_search_workers):
+    if seed is not None:
+        random.seed(seed)
+    else:
+        random.seed()
+    process_file(input_file, input_dir, output_dir, log_dir, params, workers, parallel_mode, seed, resume, local_search, local_search_workers)
+
+
+def process_files_in_parallel(input_files, input_dir, output_dir, log_dir, params, workers, parallel_mode, seed, jobs, resume, local_search, local_search_workers):
+    # every instance gets a fresh process (max_tasks_per_child=1) and its own seed, so no module state or random
+    # stream is shared between instances and a seeded sweep gives the same results whatever the scheduling
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+        futures = {
+            executor.submit(process_file_in_worker, input_file, input_dir, output_dir, log_dir, params, workers, parallel_mode, seed + index if seed is not None else None, resume, local_search, local_search_workers): input_file
+            for index, input_file in enumerate(input_files)
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error: processing {futures[future]} failed: {e}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run MCTS for timetabling.")
     default_files = [f"comp{str(i+1).zfill(2)}.ctt" for i in range(21)]
@@ -119,6 +180,12 @@ def main():
     parser.add_argument("--c_param", type=float, default=1.4, help="C parameter for the MCTS run")
     parser.add_argument("--input_files", nargs="+", default=default_files, help="List of input files to process (default: comp01.ctt - comp21.ctt)")
     parser.add_argument("--seed", type=int, default=None, help="Seed for random number generation (default: random seed)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of parallel MCTS processes (default: 1)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of input files processed at the same time, each in its own process (default: 1)")
+    parser.add_argument("--resume", action="store_true", help="Continue each file from its last checkpoint, within what is left of --time_limit and --iterations")
+    parser.add_argument("--local_search", choices=list(LOCAL_SEARCH_ENGINES), default=LOCAL_SEARCH, help=f"Local search run on each new feasible best timetable (default: {LOCAL_SEARCH})")
+    parser.add_argument("--local_search_workers", type=int, default=0, help="Background processes that improve the best feasible timetable with local search while MCTS goes on (default: 0, local search runs inside the MCTS iterations)")
+    parser.add_argument("--parallel_mode", choices=["root", "tree", "leaf"], default="root", help="Independent trees merged at the root, one shared tree with parallel simulations, or parallel simulations from each new leaf (default: root)")
     args = parser.parse_args()
 
     if args.seed is not None:
@@ -138,18 +205,25 @@ def main():
     else:
         log_dir = None
 
-    for input_file in args.input_files:
+    if args.jobs > 1:
         params = Params(args.c_param, args.iterations, args.time_limit)
-        process_file(input_file, input_dir, output_dir, log_dir, params)
+        process_files_in_parallel(args.input_files, input_dir, output_dir, log_dir, params, args.workers, args.parallel_mode, args.seed, args.jobs, args.resume, args.local_search, args.local_search_workers)
+    else:
+        for input_file in args.input_files:
+            params = Params(args.c_param, args.iterations, args.time_limit)
+            process_file(input_file, input_dir, output_dir, log_dir, params, args.workers, args.parallel_mode, args.seed, args.resume, args.local_search, args.local_search_workers)
+
+    if DEBUG_TIMINGS:
+        aggregate_timings(args.input_files)
 
     if DEBUG_EXCEL and DEBUG_LOG: 
-        log_line = {}
+        log_record = {}
         for input_file in args.input_files:
-            output_file = os.path.join(log_dir, f"{os.path.splitext(input_file)[0]}_log.txt")
-            log_line[input_file] = get_last_log_line(output_file)
+            log_file = os.path.join(log_dir, f"{os.path.splitext(input_file)[0]}_log.jsonl")
+            log_record[input_file] = get_last_log_record(log_file)
 
         #if args.input_files == default_files:
-        save_results_to_excel(log_line, args.input_files)
+        save_results_to_excel(log_record, args.input_files)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,36 @@
+from algorithm.debug import plot_progress, visualize_tree
+from algorithm.progress_metrics import load_progress
+from algorithm.tree_export import load_top_visited
+import argparse
+import os
+
+def render_progress(args):
+    for progress_file in args.progress_files:
+        output_file_name = f"{os.path.splitext(os.path.basename(progress_file))[0]}.html"
+        plot_progress(load_progress(progress_file), output_file_name)
+
+
+def render_tree(args):
+    for tree_file in args.tree_files:
+        output_file_name = os.path.splitext(os.path.basename(tree_file))[0]
+        visualize_tree(load_top_visited(tree_file, args.top_k), output_file_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders the outputs saved by MCTS runs offline.")
+    subparsers = parser.add_subparsers(dest="output", required=True)
+
+    progress = subparsers.add_parser("progress", help="HTML plots of the progress metrics saved with DEBUG_PROGRESS")
+    progress.add_argument("progress_files", nargs="+", help="Progress CSV files (e.g. constraint_progress/comp01_constraint_progress.csv)")
+    progress.set_defaults(run=render_progress)
+
+    tree = subparsers.add_parser("tree", help="PDF of the most visited subtree of the trees saved with DEBUG_TREE (needs Graphviz)")
+    tree.add_argument("tree_files", nargs="+", help="Tree CSV files (e.g. mcts_tree/comp01_tree.csv)")
+    tree.add_argument("--top_k", type=int, default=500, help="Number of most visited nodes to draw (default: 500)")
+    tree.set_defaults(run=render_tree)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os, random
+import pytest
+from benchmark import load_instance
+from algorithm.mcts import MCTS, MCTSConfig, Params
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "input")
+
+
+def build_mcts(tmp_path, input_file = "comp01.ctt"):
+    db, days, periods_per_day = load_instance(input_file, INPUT_DIR)
+    mcts = MCTS(db, MCTSConfig(Params(iterations=1), days, periods_per_day, str(tmp_path / "output.txt")))
+    mcts.close_writer()
+    return mcts
+
+
+def lectures_of_two_courses(mcts):
+    courses = [events for events in mcts.state.course_events if len(events) >= 2]
+    return courses[0], courses[1]
+
+
+def test_same_course_lectures_in_one_room(tmp_path):
+    mcts = build_mcts(tmp_path)
+    state = mcts.state
+    first, second = lectures_of_two_courses(mcts)[0][:2]
+    state.assign(first, 0, 0, 0)
+    state.assign(second, 0, 0, 0)
+
+    state.evaluator.cross_check(mcts.conflicts_checker)
+
+
+def test_room_clash_counts_each_further_course(tmp_path):
+    mcts = build_mcts(tmp_path)
+    state = mcts.state
+    course_a, course_b = lectures_of_two_courses(mcts)
+    state.assign(course_a[0], 0, 0, 0)
+    state.assign(course_b[0], 0, 0, 0)
+    hard_penalty = state.evaluator.hard_penalty
+    state.evaluator.cross_check(mcts.conflicts_checker)
+
+    state.assign(course_a[1], 0, 0, 0) # a course already in the room is no further clash
+    state.evaluator.cross_check(mcts.conflicts_checker)
+    state.unassign(course_a[1])
+    assert state.evaluator.hard_penalty == hard_penalty
+
+
+@pytest.mark.parametrize("input_file", ["ToyExample.ctt", "comp01.ctt", "comp05.ctt", "comp07.ctt", "comp11.ctt", "comp12.ctt"])
+def test_random_assignments_match_full_evaluation(tmp_path, input_file):
+    mcts = build_mcts(tmp_path, input_file)
+    state = mcts.state
+    rng = random.Random(0)
+    events = list(range(len(state.room)))
+    for event in events:
+        state.assign(event, rng.randrange(len(state.room_ids)), rng.randrange(state.days), rng.randrange(state.periods_per_day))
+    state.evaluator.cross_check(mcts.conflicts_checker)
+
+    for event in rng.sample(events, len(events) // 2):
+        state.move(event, rng.randrange(len(state.room_ids)), rng.randrange(state.days), rng.randrange(state.periods_per_day))
+    state.evaluator.cross_check(mcts.conflicts_checker)
+
+    unassigned_events = rng.sample(events, len(events) // 4)
+    for event in unassigned_events:
+        state.unassign(event)
+    state.evaluator.cross_check(mcts.conflicts_checker, unassigned_events)
@@ -0,0 +1,69 @@
+import json
+from algorithm import simulation_results_writer
+from algorithm.simulation_results_writer import SolutionWriter, read_last_progress_record
+
+
+class AtexitRegistry:
+
+    def __init__(self):
+        self.callbacks = []
+
+
+    def register(self, callback):
+        self.callbacks.append(callback)
+
+
+    def unregister(self, callback):
+        self.callbacks = [registered for registered in self.callbacks if registered != callback]
+
+
+def test_closed_writers_leave_no_exit_hook(tmp_path, monkeypatch):
+    registry = AtexitRegistry()
+    monkeypatch.setattr(simulation_results_writer, "atexit", registry)
+    monkeypatch.chdir(tmp_path) # the progress log goes to the log folder of the working directory
+    (tmp_path / "log").mkdir()
+    output_filename = tmp_path / "output.txt"
+
+    for _ in range(3):
+        writer = SolutionWriter(str(output_filename), interval=0)
+        writer.submit_timetable([("c0001", "R1", 0, 0)], 0, 0, -1)
+        assert len(registry.callbacks) == 1
+        writer.close()
+        assert registry.callbacks == []
+    assert output_filename.read_text() == "c0001 R1 0 0\n"
+    SolutionWriter(str(output_filename)).close()
+    assert registry.callbacks == []
+
+
+def write_log(tmp_path, text):
+    filename = tmp_path / "comp01_log.jsonl"
+    filename.write_bytes(text.encode())
+    return str(filename)
+
+
+def test_last_progress_record(tmp_path):
+    records = [{"timestamp": 1.0 + i, "elapsed": float(i), "iteration": i, "hard": 0, "soft": -100 + i, "phase": "mcts"} for i in range(50)]
+    filename = write_log(tmp_path, "".join(json.dumps(record) + "\n" for record in records))
+    for chunk_size in (1, 7, 4096):
+        assert read_last_progress_record(filename, chunk_size) == records[-1]
+
+
+def test_truncated_last_progress_record(tmp_path):
+    records = [{"timestamp": 1.0, "elapsed": 0.5, "iteration": 3, "hard": 0, "soft": -20, "phase": "mcts"},
+               {"timestamp": 2.0, "elapsed": 1.5, "iteration": 4, "hard": 0, "soft": -18, "phase": "hill_climbing"}]
+    text = json.dumps(records[0]) + "\n" + json.dumps(records[1])
+    filename = write_log(tmp_path, text[:-10]) # killed in the middle of the last record
+    for chunk_size in (1, 7, 4096):
+        assert read_last_progress_record(filename, chunk_size) == records[0]
+    assert read_last_progress_record(write_log(tmp_path, text[:10])) is None
+    assert read_last_progress_record(write_log(tmp_path, "")) is None
+    assert read_last_progress_record(str(tmp_path / "missing.jsonl")) is None
+
+
+def test_directory_exists_when_created_concurrently(tmp_path, monkeypatch):
+    directory = tmp_path / "timings"
+    directory.mkdir()
+    monkeypatch.setattr(simulation_results_writer.os.path, "exists", lambda path: False) # another process created it after the check
+    simulation_results_writer.directory_exists(str(directory))
+    simulation_results_writer.directory_exists(str(tmp_path / "log" / "nested"))
+    assert (tmp_path / "log" / "nested").is_dir()